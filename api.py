@@ -1,16 +1,44 @@
 # api.py
 
+import asyncio
+import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
-from typing import Dict, Any
-from scraap import run_veile_workflow
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, AsyncIterator, List
+from scraap import run_veile_workflow, stream_veile_workflow, warm_backend
+from jobs import JobManager
+from extraction import warm_extract_pool
+from metrics import REGISTRY
+from blob_store import BlobStore
+
+# File de tâches partagée par toutes les requêtes (workers démarrés avec l'application)
+job_manager = JobManager()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.gather(asyncio.to_thread(warm_extract_pool), asyncio.to_thread(warm_backend))
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+
+
 # Crée une instance de l'application FastAPI
 app = FastAPI(
     title="Agent de Veille Stratégique pour l'Afrique",
     description="Une API pour lancer un agent LangGraph qui scrape et analyse l'actualité tech.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
+class JobRequest(BaseModel):
+    query: str = Field(..., min_length=3, description="Le thème ou la question pour guider la veille stratégique.")
+    incremental: bool = Field(False, description="Ne traiter que les articles apparus depuis le dernier run.")
+
+
 # Définition de l'endpoint racine (pour vérifier que l'API est en ligne)
 @app.get("/")
 def read_root():
@@ -20,6 +48,15 @@ def read_root():
     return {"status": "Agent de Veille API is running"}
 
 
+# Métriques locales au format Prometheus (durées des nœuds, latences, tokens, cache...)
+@app.get("/metrics", response_class=PlainTextResponse)
+def lire_metriques():
+    """
+    Expose les métriques cumulées depuis le démarrage du serveur, au format texte Prometheus.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 # Définition de l'endpoint principal pour lancer la veille
 @app.get("/veille", response_model=Dict[str, Any])
 async def lancer_veille(
@@ -28,6 +65,16 @@ async def lancer_veille(
         min_length=3,
         title="Sujet de la veille",
         description="Le thème ou la question pour guider la veille stratégique. Ex: 'Tendances Fintech en Afrique'"
+    ),
+    incremental: bool = Query(
+        False,
+        title="Mode incrémental",
+        description="Ne traite que les articles apparus depuis le dernier run et les fusionne dans le classement précédent."
+    ),
+    include_content: bool = Query(
+        False,
+        title="Inclure le texte des articles",
+        description="Ajoute le texte extrait de chaque article (lu dans le magasin local à partir de son content_id)."
     )
 ):
     """
@@ -39,16 +86,90 @@ async def lancer_veille(
     try:
         # Comme notre workflow est asynchrone, on utilise `await` pour l'appeler.
         # FastAPI gère la boucle d'événements pour nous.
-        result = await run_veile_workflow(query)
+        result = await run_veile_workflow(query, incremental=incremental)
         
         if result.get("error_message"):
             # Si le workflow retourne une erreur gérée, on la renvoie comme une erreur HTTP
             raise HTTPException(status_code=500, detail=result["error_message"])
             
         print("Veille terminée avec succès.")
+        if include_content:
+            result["analyzed_articles"] = _with_content(result.get("analyzed_articles") or [])
         return result
 
     except Exception as e:
         # Gère les erreurs inattendues qui pourraient survenir
         print(f"Erreur inattendue dans l'API : {e}")
-        raise HTTPException(status_code=500, detail=f"Une erreur interne inattendue est survenue : {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Une erreur interne inattendue est survenue : {str(e)}")
+
+
+def _with_content(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    blob_store = BlobStore()
+    try:
+        texts = blob_store.get_many(article["content_id"] for article in articles if article.get("content_id"))
+    finally:
+        blob_store.close()
+    return [{**article, "content": texts.get(article.get("content_id"))} for article in articles]
+
+
+def _format_event(event: Dict[str, Any], fmt: str) -> str:
+    payload = json.dumps(event, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+# Endpoint de veille en flux : les résultats arrivent au fil de l'eau
+@app.get("/veille/stream")
+async def lancer_veille_stream(
+    query: str = Query(
+        ...,
+        min_length=3,
+        title="Sujet de la veille",
+        description="Le thème ou la question pour guider la veille stratégique. Ex: 'Tendances Fintech en Afrique'"
+    ),
+    incremental: bool = Query(False, title="Mode incrémental"),
+    format: str = Query(
+        "ndjson",
+        pattern="^(ndjson|sse)$",
+        title="Format du flux",
+        description="'ndjson' (un objet JSON par ligne) ou 'sse' (Server-Sent Events)."
+    )
+):
+    """
+    Lance la veille et renvoie les événements au fur et à mesure :
+    `site_scraped`, `article_analyzed` (sans le texte brut), puis `final_ranking`.
+
+    Le premier résultat arrive en quelques secondes, sans attendre la fin du workflow.
+    """
+    print(f"Lancement de la veille en flux pour la requête : '{query}'")
+
+    async def event_stream() -> AsyncIterator[str]:
+        async for event in stream_veile_workflow(query, incremental=incremental):
+            yield _format_event(event, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+# Endpoints de la file de tâches : la veille tourne en arrière-plan, le client vient chercher le résultat
+@app.post("/jobs", status_code=202)
+async def creer_job(request: JobRequest):
+    """
+    Met une veille en file et renvoie immédiatement son identifiant.
+
+    Si une veille identique est déjà en file ou en cours, son identifiant est renvoyé (`coalesced: true`)
+    au lieu de lancer un second run.
+    """
+    return job_manager.submit(request.query, incremental=request.incremental)
+
+
+@app.get("/jobs/{job_id}")
+async def lire_job(job_id: str):
+    """
+    Renvoie l'état d'une veille (`queued`, `running`, `done`, `failed`) et son résultat une fois terminée.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job inconnu : {job_id}")
+    return job
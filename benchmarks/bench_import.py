@@ -0,0 +1,83 @@
+# benchmarks/bench_import.py
+"""
+Temps de démarrage des points d'entrée (import à froid, dans un processus neuf).
+
+Chaque module est importé plusieurs fois dans un interpréteur Python neuf ; le script
+rapporte la médiane et le minimum du temps d'import, les dépendances lourdes déjà
+chargées à ce stade, puis le coût du préchauffage du backend (graphe, prompts, client LLM, pile HTTP),
+que le premier run paierait sinon.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_import --repeat 5 scraap api scheduler
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+_HEAVY_MODULES = ("langchain_deepseek", "langchain_core", "langgraph", "openai", "trafilatura", "numpy", "lxml")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+result = {{"import_s": imported, "loaded": [m for m in {heavy!r} if m in sys.modules]}}
+if {first_run!r} and hasattr({module}, "warm_backend"):
+    started = time.perf_counter()
+    {module}.warm_backend()
+    result["first_run_s"] = time.perf_counter() - started
+print(json.dumps(result))
+"""
+
+
+def _probe(module: str, first_run: bool) -> Dict:
+    env = dict(os.environ)
+    # Clé factice : le client LLM est construit mais jamais appelé
+    env.setdefault("DEEPSEEK_API_KEY", "benchmark-offline")
+    env.setdefault("LANGSMITH_TRACING", "false")
+    code = _PROBE.format(module=module, heavy=_HEAVY_MODULES, first_run=first_run)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(module: str, repeat: int) -> Dict:
+    probes: List[Dict] = [_probe(module, first_run=True) for _ in range(repeat)]
+    imports = [probe["import_s"] for probe in probes]
+    summary = {"module": module, "import_p50_s": round(statistics.median(imports), 3),
+               "import_min_s": round(min(imports), 3), "loaded": probes[-1]["loaded"]}
+    if "first_run_s" in probes[-1]:
+        summary["first_run_p50_s"] = round(statistics.median(probe["first_run_s"] for probe in probes), 3)
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Temps d'import à froid des points d'entrée.")
+    parser.add_argument("modules", nargs="*", default=["scraap", "jobs", "scheduler", "api"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Écrit les résultats bruts dans ce fichier.")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'Module':<12}{'p50 (s)':>10}{'min (s)':>10}{'1er run (s)':>14}  Dépendances lourdes chargées")
+    for module in args.modules:
+        try:
+            result = measure(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<12}  échec de l'import : {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        results.append(result)
+        print(f"{module:<12}{result['import_p50_s']:>10}{result['import_min_s']:>10}"
+              f"{result.get('first_run_p50_s', '-'):>14}  {', '.join(result['loaded']) or '-'}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmark hors ligne du workflow complet.
+
+Sert des pages de test pour chaque entrée de SCRAPER_REGISTRY depuis un serveur local,
+remplace DeepSeek par un modèle factice, exécute run_veile_workflow de bout en bout et
+rapporte le débit (articles/s), les latences p50/p95 par étape et le pic mémoire.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_pipeline --articles-per-site 20 --latency 0.05 --llm-delay 0.5
+    python -m benchmarks.bench_pipeline --feed-sites 2   # les deux premières sources servies en RSS
+    python -m benchmarks.bench_pipeline --incremental --query "fintech Afrique" --query "intelligence artificielle"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Configuration hors ligne, à poser avant l'import du backend
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-offline")
+os.environ.setdefault("SCRAAPY_CACHE_ENABLED", "false")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+os.environ.setdefault("LANGSMITH_API_KEY", "")
+os.environ.setdefault("LANGSMITH_PROJECT", "")
+# Magasins isolés : le premier run télécharge tout, les suivants reçoivent des 304
+_BENCH_DIR = tempfile.mkdtemp(prefix="scraapy-bench-")
+os.environ.setdefault("SCRAAPY_VALIDATOR_STORE_PATH", os.path.join(_BENCH_DIR, "http.sqlite3"))
+os.environ.setdefault("SCRAAPY_BLOB_STORE_PATH", os.path.join(_BENCH_DIR, "blobs.sqlite3"))
+os.environ.setdefault("SCRAAPY_RUN_STATE_PATH", os.path.join(_BENCH_DIR, "run_state.sqlite3"))
+
+import scraap  # noqa: E402
+from benchmarks.fake_llm import FakeAnalysisModel  # noqa: E402
+from benchmarks.fixtures import FixtureServer, build_fixtures  # noqa: E402
+from extraction import warm_extract_pool  # noqa: E402
+from sources import SOURCE_FEED, Source  # noqa: E402
+
+
+@contextmanager
+def local_registry(server: FixtureServer, sites) -> Iterator[None]:
+    """Fait pointer SCRAPER_REGISTRY vers le serveur local le temps du benchmark."""
+    original = dict(scraap.SCRAPER_REGISTRY)
+    scraap.SCRAPER_REGISTRY.clear()
+    for site in sites:
+        url, source = server.base_url + site.homepage_path, original[site.key]
+        if site.feed and source.type != SOURCE_FEED:
+            source = Source(name=source.name, url=url, type=SOURCE_FEED, ignore_domains=source.ignore_domains,
+                            timeout=source.timeout)
+        scraap.SCRAPER_REGISTRY[url] = source
+    try:
+        yield
+    finally:
+        scraap.SCRAPER_REGISTRY.clear()
+        scraap.SCRAPER_REGISTRY.update(original)
+
+
+async def _run_once(model: FakeAnalysisModel, query: str, incremental: bool = False) -> Dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = await scraap.run_veile_workflow(query, incremental=incremental, chat_model=model)
+    wall_time = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    articles = result.get("analyzed_articles") or []
+    analyzed = sum(1 for article in articles if not article.get("error"))
+    run_metrics = result.get("run_metrics", {})
+    return {
+        "query": query,
+        "new_articles": result.get("new_articles_count"),
+        "wall_time_s": round(wall_time, 3),
+        "articles_total": len(articles),
+        "articles_analyzed": analyzed,
+        "throughput_articles_per_s": round(analyzed / wall_time, 2) if wall_time else 0.0,
+        "stages": run_metrics.get("article_stages", {}),
+        "nodes": run_metrics.get("nodes", {}),
+        "llm_calls": run_metrics.get("llm_calls", 0),
+        "retries": run_metrics.get("retries", 0),
+        "llm_scheduler": run_metrics.get("llm_scheduler", {}),
+        "tokens": run_metrics.get("tokens", {}),
+        "content_tokens": run_metrics.get("content_tokens", {}),
+        "http_statuses": run_metrics.get("http_statuses", {}),
+        "near_duplicates": run_metrics.get("near_duplicates", 0),
+        "off_topic": run_metrics.get("off_topic", 0),
+        "site_bytes": sum(site["bytes"] for site in run_metrics.get("sites", [])),
+        "peak_python_mb": round(peak / 1024 / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "error_message": result.get("error_message"),
+    }
+
+
+def _print_report(runs) -> None:
+    for index, run in enumerate(runs, 1):
+        print(f"\n=== Run {index} ('{run['query']}') : {run['wall_time_s']} s, {run['articles_analyzed']}/{run['articles_total']} "
+              f"articles analysés, {run['throughput_articles_per_s']} articles/s ===")
+        if run["new_articles"] is not None:
+            print(f"Nouveaux articles (mode incrémental) : {run['new_articles']}")
+        if run["error_message"]:
+            print(f"Erreur : {run['error_message']}")
+        print(f"{'Étape':<16}{'n':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'total (s)':>12}")
+        for stage, values in sorted(run["stages"].items()):
+            print(f"{stage:<16}{values['count']:>6}{values['p50_s']:>10}{values['p95_s']:>10}{values['total_s']:>12}")
+        for node, values in sorted(run["nodes"].items()):
+            print(f"Nœud {node} : {values['count']} exécution(s), max {values['max_s']} s")
+        print(f"Statuts HTTP des articles : {run['http_statuses']} | Octets des pages d'accueil : {run['site_bytes']}")
+        print(f"Appels LLM : {run['llm_calls']} | Quasi-doublons regroupés : {run['near_duplicates']} | "
+              f"Hors sujet : {run['off_topic']} | Tokens : {run['tokens']} | "
+              f"Pic mémoire Python : {run['peak_python_mb']} Mo | RSS max : {run['max_rss_mb']} Mo")
+        print(f"Reprises LLM : {run['retries']} | Ordonnanceur LLM : {run['llm_scheduler']}")
+        print(f"Tokens des articles (avant / après condensation) : {run['content_tokens']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du workflow de veille.")
+    parser.add_argument("--articles-per-site", type=int, default=20)
+    parser.add_argument("--shared-stories", type=int, default=5, help="Histoires reprises par tous les sites.")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Paragraphes par article.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence du serveur local, en secondes.")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses HTTP 503.")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="Délai du modèle factice, en secondes.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-capacity", type=int, default=0, help="Appels simultanés acceptés avant un 429 simulé (0 : illimité).")
+    parser.add_argument("--feed-sites", type=int, default=0, help="Nombre de sources servies en flux RSS.")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--query", action="append", help="Requête (répétable : chaque run enchaîne les requêtes).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Runs incrémentaux ; vérifie que le premier run de chaque requête trouve des articles.")
+    parser.add_argument("--json", dest="json_path", help="Écrit les résultats bruts dans ce fichier.")
+    args = parser.parse_args(argv)
+    queries = args.query or ["Tendances fintech en Afrique"]
+
+    site_urls = list(scraap.SCRAPER_REGISTRY)
+    feed_sites = [url for url in site_urls if scraap.SCRAPER_REGISTRY[url].type == SOURCE_FEED] + site_urls[:args.feed_sites]
+    pages, sites = build_fixtures(scraap.SCRAPER_REGISTRY, args.articles_per_site, shared_stories=args.shared_stories,
+                                  paragraphs=args.paragraphs, feed_sites=feed_sites)
+    # Le pool d'extraction et le graphe survivent aux runs : on mesure le régime établi, sans le démarrage
+    # des processus ni le chargement de LangGraph (mesuré à part par bench_import.py)
+    warm_extract_pool()
+    scraap.warm_backend()
+    runs = []
+    with FixtureServer(pages, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as server:
+        with local_registry(server, sites):
+            for _ in range(args.runs):
+                for query in queries:
+                    model = FakeAnalysisModel(delay=args.llm_delay, failure_rate=args.llm_failure_rate,
+                                              capacity=args.llm_capacity)
+                    runs.append(asyncio.run(_run_once(model, query, args.incremental)))
+
+    _print_report(runs)
+    # L'état incrémental est propre à chaque requête : le premier run de chacune voit tous les articles
+    starved = [run["query"] for run in runs[:len(queries)] if args.incremental and not run["new_articles"]]
+    for query in starved:
+        print(f"ÉCHEC : le premier run incrémental de '{query}' n'a trouvé aucun nouvel article.")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "runs": runs}, f, ensure_ascii=False, indent=2)
+    return 0 if not starved and all(not run["error_message"] for run in runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# benchmarks/fake_llm.py
+"""
+Modèle de chat factice pour les benchmarks : renvoie des analyses valides après un
+délai configurable, sans appel réseau. Il expose la même interface que le modèle réel
+pour le workflow (`with_structured_output`, y compris `include_raw=True`). Au-delà de
+`capacity` appels simultanés, il répond par une erreur 429, comme un fournisseur saturé.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Any, Dict, Type
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+_ARTICLE_ID = re.compile(r'<article id="(\d+)">')
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+def _fake_analysis(seed: str) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {
+        "impact_afrique": "Impact simulé sur l'écosystème africain.",
+        "problematique_africaine": "Dépendance simulée aux infrastructures étrangères.",
+        "eveil_de_conscience": "Leçon simulée pour les acteurs de la tech africaine.",
+        "piste_opportunite": "Opportunité simulée pour les startups locales.",
+        "type_evenement": rng.choice(["Tendance", "Levée de fonds", "Lancement de produit"]),
+        "resume_strategique": "Résumé stratégique simulé.",
+        "lecon_a_retenir": "Conseil simulé.",
+        "impact_potentiel": "Impact potentiel simulé.",
+        "score_pertinence": rng.randint(1, 10),
+        "resume_neutre": ("Résumé neutre simulé. " * 40)[:750],
+        "problematique_generale": "Problématique générale simulée.",
+    }
+
+
+class FakeAnalysisModel:
+    def __init__(self, delay: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0,
+                 capacity: int = 0):
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.capacity = capacity
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.rate_limited = 0
+
+    def _draw(self) -> tuple:
+        self.calls += 1
+        return max(0.0, self.delay + self._rng.uniform(-self.jitter, self.jitter)), self._rng.random() < self.failure_rate
+
+    def _respond(self, prompt: Any, schema: Type[BaseModel], include_raw: bool) -> Any:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        if "analyses" in schema.model_fields:
+            item_schema = schema.model_fields["analyses"].annotation.__args__[0]
+            parsed = schema(analyses=[item_schema(article_id=article_id, **_fake_analysis(text[:200] + article_id))
+                                      for article_id in _ARTICLE_ID.findall(text)])
+        else:
+            parsed = schema(**_fake_analysis(text[:200]))
+        if not include_raw:
+            return parsed
+        # ≈ 4 caractères par token, comme l'estimation du workflow
+        prompt_tokens, completion_tokens = len(text) // 4, len(parsed.model_dump_json()) // 4
+        raw = AIMessage(content="", usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                                    "total_tokens": prompt_tokens + completion_tokens})
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+    def with_structured_output(self, schema: Type[BaseModel], include_raw: bool = False, **kwargs) -> RunnableLambda:
+        def invoke(prompt):
+            delay, fail = self._draw()
+            time.sleep(delay)
+            if fail:
+                raise RuntimeError("Erreur simulée du fournisseur LLM")
+            return self._respond(prompt, schema, include_raw)
+
+        async def ainvoke(prompt):
+            if self.capacity and self.in_flight >= self.capacity:
+                self.rate_limited += 1
+                raise FakeRateLimitError("429 Too Many Requests (simulé)")
+            delay, fail = self._draw()
+            self.in_flight += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.in_flight -= 1
+            if fail:
+                raise RuntimeError("Erreur simulée du fournisseur LLM")
+            return self._respond(prompt, schema, include_raw)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
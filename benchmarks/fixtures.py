@@ -0,0 +1,223 @@
+# benchmarks/fixtures.py
+"""
+Pages de test déterministes et serveur HTTP local qui les sert.
+
+Chaque entrée de SCRAPER_REGISTRY a une page d'accueil dont le balisage est construit à partir
+de son sélecteur CSS, et chaque lien pointe vers une page d'article servie par le même serveur.
+La page est relue avec les règles de la source : un sélecteur que le générateur ne sait pas
+reproduire fait échouer le benchmark au lieu de donner une source sans article.
+Une fraction des articles reprend la même histoire sur plusieurs sites, comme en réalité.
+Les sites listés dans `feed_sites` sont servis en flux RSS plutôt qu'en page HTML.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Collection, Dict, List, Tuple
+from urllib.parse import urlparse
+
+import cssselect
+
+from sources import SOURCE_FEED, Source
+
+_FEED_ITEM_TEMPLATE = "<item><title>{title}</title><link>{href}</link><guid>{href}</guid></item>"
+
+_WORDS = (
+    "startup fintech funding round investors Lagos Nairobi payments mobile money regulation central bank "
+    "infrastructure broadband data centre cloud artificial intelligence model training talent engineers "
+    "ecosystem growth revenue customers merchants expansion market licence partnership acquisition "
+    "electricity solar logistics agritech healthtech platform users adoption policy government Africa"
+).split()
+
+
+def _feed_item(href: str, title: str) -> str:
+    return _FEED_ITEM_TEMPLATE.format(href=href, title=escape(title))
+
+
+def _compound_tag(selector, default_tag: str) -> Tuple[str, Dict[str, str]]:
+    """Balise et attributs d'un élément qui satisfait un sélecteur simple (a.x#y[z=v])."""
+    attributes: Dict[str, str] = {}
+    classes: List[str] = []
+    while not isinstance(selector, cssselect.parser.Element):
+        if isinstance(selector, cssselect.parser.Class):
+            classes.insert(0, selector.class_name)
+        elif isinstance(selector, cssselect.parser.Hash):
+            attributes["id"] = selector.id
+        elif isinstance(selector, cssselect.parser.Attrib) and selector.operator in ("exists", "=", "~=", "|=", "^=", "$=", "*="):
+            value = getattr(selector.value, "value", selector.value)
+            attributes[selector.attrib] = value if value is not None else ""
+        else:
+            raise ValueError(f"Sélecteur non reproductible dans les pages de test : {selector!r}")
+        selector = selector.selector
+    if classes:
+        attributes["class"] = " ".join(classes)
+    tag = selector.element if selector.element and selector.element != "*" else default_tag
+    return tag, attributes
+
+
+def _link_markup(source: Source) -> Callable[[str, str], str]:
+    """Fonction (href, titre) -> balisage d'un lien que le sélecteur de la source retrouve."""
+    steps = []
+    tree = cssselect.parse(source.selector)[0].parsed_tree
+    while isinstance(tree, cssselect.parser.CombinedSelector):
+        if tree.combinator not in (" ", ">"):
+            raise ValueError(f"Combinateur '{tree.combinator}' non reproductible pour {source.name}")
+        steps.insert(0, tree.subselector)
+        tree = tree.selector
+    steps.insert(0, tree)
+    ancestors = [_compound_tag(step, "div") for step in steps[:-1]]
+    link_tag, link_attributes = _compound_tag(steps[-1], "a")
+
+    def open_tag(tag: str, attributes: Dict[str, str]) -> str:
+        return "<" + tag + "".join(f' {name}="{escape(value)}"' for name, value in attributes.items()) + ">"
+
+    prefix = "".join(open_tag(tag, attributes) for tag, attributes in ancestors)
+    suffix = "".join(f"</{tag}>" for tag, _ in reversed(ancestors))
+
+    def markup(href: str, title: str) -> str:
+        attributes = dict(link_attributes)
+        for rule, value in ((source.href, href), (source.title, title)):
+            if rule.startswith("@"):
+                attributes[rule[1:]] = value
+        return f"{prefix}{open_tag(link_tag, attributes)}{escape(title)}</{link_tag}>{suffix}"
+
+    return markup
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(12, 22))]
+    return " ".join(words).capitalize() + "."
+
+
+def _article_html(title: str, story_id: int, paragraphs: int) -> str:
+    rng = random.Random(story_id)
+    body = "\n".join(f"<p>{' '.join(_sentence(rng) for _ in range(4))}</p>" for _ in range(paragraphs))
+    day = 1 + story_id % 28
+    return (
+        f"<html><head><title>{escape(title)}</title>"
+        f'<meta property="article:published_time" content="2025-07-{day:02d}T08:00:00Z"></head>'
+        f"<body><header><nav>Accueil | Tech | Business</nav></header>"
+        f"<article><h1>{escape(title)}</h1>\n{body}\n</article>"
+        f"<footer>© Fixture</footer></body></html>"
+    )
+
+
+@dataclass
+class FixtureSite:
+    key: str
+    homepage_path: str
+    feed: bool = False
+    article_paths: List[str] = field(default_factory=list)
+
+
+def build_fixtures(sources: Dict[str, Source], articles_per_site: int, shared_stories: int = 5,
+                   paragraphs: int = 8, feed_sites: Collection[str] = ()) -> Tuple[Dict[str, str], List[FixtureSite]]:
+    """Renvoie les pages (chemin -> HTML) et la description des sites de test, pour chaque source (URL -> Source)."""
+    pages: Dict[str, str] = {}
+    sites: List[FixtureSite] = []
+    next_story = 1000
+    for index, (site_url, source) in enumerate(sources.items()):
+        host = urlparse(site_url).netloc
+        slug = f"site{index}"
+        feed = site_url in feed_sites or source.type == SOURCE_FEED
+        site = FixtureSite(key=site_url, homepage_path=f"/{slug}/feed/" if feed else f"/{slug}/", feed=feed)
+        if feed:
+            source = Source(name=source.name, url=site_url, type=SOURCE_FEED, ignore_domains=source.ignore_domains)
+            link = _feed_item
+        else:
+            link = _link_markup(source)
+        links = []
+        for i in range(articles_per_site):
+            # Les premières histoires sont communes à tous les sites (titres légèrement différents)
+            if i < shared_stories:
+                story_id, title = i, f"Story {i}: African fintech raises new funding ({host})"
+            else:
+                story_id, title = next_story, f"Story {next_story}: ecosystem update from {host}"
+                next_story += 1
+            path = f"/{slug}/articles/{i}.html"
+            pages[path] = _article_html(title, story_id, paragraphs)
+            site.article_paths.append(path)
+            links.append(link(path, title))
+        if feed:
+            pages[site.homepage_path] = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                                         f"<title>{escape(host)}</title>{''.join(links)}</channel></rss>")
+        else:
+            pages[site.homepage_path] = f"<html><body><main>{''.join(links)}</main></body></html>"
+        found = len(source.parse(pages[site.homepage_path], base_url="http://127.0.0.1" + site.homepage_path))
+        if found != articles_per_site:
+            raise ValueError(f"La page de test de {source.name} donne {found} lien(s) sur {articles_per_site} "
+                             f"avec les règles de la source ({source.selector or source.type})")
+        sites.append(site)
+    return pages, sites
+
+
+class FixtureServer:
+    """Serveur HTTP local avec latence et erreurs injectées ; chaque page porte un ETag."""
+
+    def __init__(self, pages: Dict[str, str], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._rng_lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            return delay, self._rng.random() < self.error_rate
+
+    def _handler_class(self) -> Callable:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                delay, fail = server._draw()
+                if delay:
+                    time.sleep(delay)
+                page = server.pages.get(self.path.split("?", 1)[0])
+                if fail or page is None:
+                    self.send_response(503 if fail else 404)
+                    self.end_headers()
+                    return
+                body = page.encode("utf-8")
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
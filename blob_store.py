@@ -0,0 +1,59 @@
+# blob_store.py
+"""
+Magasin local (SQLite) des textes d'articles extraits.
+
+Les résultats du workflow ne transportent plus le texte des articles, seulement son
+identifiant (`content_id`, empreinte du texte) : l'état LangGraph, les réponses de
+l'API et les rapports sauvegardés gardent ainsi une taille indépendante de la longueur
+des articles. Le texte reste consultable ici, par exemple avec `/veille?include_content=true`.
+"""
+
+import os
+import sqlite3
+import time
+import zlib
+from typing import Dict, Iterable, Optional
+
+from cache import content_fingerprint
+
+BLOB_STORE_PATH = os.getenv("SCRAAPY_BLOB_STORE_PATH", "scraapy_blobs.sqlite3")
+BLOB_RETENTION_SECONDS = float(os.getenv("SCRAAPY_BLOB_RETENTION_DAYS", "7")) * 86400
+
+
+class BlobStore:
+    def __init__(self, path: str = BLOB_STORE_PATH, retention_seconds: float = BLOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                id TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def put(self, text: str) -> str:
+        # Identifiant dérivé du contenu : un même texte n'est stocké qu'une fois
+        blob_id = content_fingerprint(text)[:32]
+        now = time.time()
+        updated = self._conn.execute("UPDATE blobs SET updated_at = ? WHERE id = ?", (now, blob_id)).rowcount
+        if not updated:
+            self._conn.execute("INSERT OR REPLACE INTO blobs (id, body, updated_at) VALUES (?, ?, ?)",
+                               (blob_id, zlib.compress(text.encode("utf-8")), now))
+        self._conn.commit()
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[str]:
+        row = self._conn.execute("SELECT body FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def get_many(self, blob_ids: Iterable[str]) -> Dict[str, str]:
+        return {blob_id: text for blob_id in set(blob_ids) if (text := self.get(blob_id)) is not None}
+
+    def prune(self) -> None:
+        self._conn.execute("DELETE FROM blobs WHERE updated_at <= ?", (time.time() - self.retention_seconds,))
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
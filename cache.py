@@ -0,0 +1,158 @@
+# cache.py
+"""
+Cache persistant (SQLite) des articles déjà téléchargés et analysés.
+
+Une entrée est identifiée par l'URL normalisée, l'empreinte du texte extrait
+et la version de l'analyse (prompt + modèle + schéma). Une entrée récente pour
+une URL évite à la fois le téléchargement et l'appel au LLM ; un contenu
+identique re-téléchargé réutilise l'analyse existante.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CACHE_PATH = os.getenv("SCRAAPY_CACHE_PATH", "scraapy_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.getenv("SCRAAPY_CACHE_TTL_HOURS", "72")) * 3600
+CACHE_MAX_BYTES = int(float(os.getenv("SCRAAPY_CACHE_MAX_MB", "500")) * 1024 * 1024)
+
+# Paramètres de suivi qui ne changent pas le contenu de la page
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref")
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(_TRACKING_PARAMS)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def content_fingerprint(content: str) -> str:
+    return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedArticle:
+    content: Optional[str]
+    date: Optional[str]
+    analysis: Dict
+    content_hash: str
+
+
+class AnalysisCache:
+    def __init__(self, path: str = CACHE_PATH, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # Compteurs du run : hits = ni téléchargement ni LLM, revalidated = téléchargé mais analyse réutilisée
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT NOT NULL,
+                version TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                html BLOB,
+                content TEXT,
+                date TEXT,
+                analysis TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (url, version, content_hash)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_access ON articles(last_access)")
+        self._conn.commit()
+
+    def _row_to_article(self, row) -> CachedArticle:
+        content, date, analysis, content_hash = row
+        return CachedArticle(content=content, date=date, analysis=json.loads(analysis), content_hash=content_hash)
+
+    def _touch(self, url: str, version: str, content_hash: str) -> None:
+        self._conn.execute("UPDATE articles SET last_access = ? WHERE url = ? AND version = ? AND content_hash = ?",
+                           (time.time(), url, version, content_hash))
+        self._conn.commit()
+
+    def get(self, url: str, version: str) -> Optional[CachedArticle]:
+        """Entrée encore fraîche pour cette URL : le téléchargement peut être évité."""
+        key = normalize_url(url)
+        row = self._conn.execute(
+            "SELECT content, date, analysis, content_hash FROM articles "
+            "WHERE url = ? AND version = ? AND fetched_at > ? ORDER BY fetched_at DESC LIMIT 1",
+            (key, version, time.time() - self.ttl_seconds)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        self._touch(key, version, row[3])
+        return self._row_to_article(row)
+
+    def get_by_content(self, url: str, content_hash: str, version: str) -> Optional[CachedArticle]:
+        """Analyse existante pour un contenu identique : l'appel au LLM peut être évité."""
+        key = normalize_url(url)
+        row = self._conn.execute(
+            "SELECT content, date, analysis, content_hash FROM articles "
+            "WHERE url = ? AND version = ? AND content_hash = ?",
+            (key, version, content_hash)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.revalidated += 1
+        # Le contenu n'a pas changé : on repart pour une nouvelle période de fraîcheur
+        now = time.time()
+        self._conn.execute("UPDATE articles SET fetched_at = ?, last_access = ? WHERE url = ? AND version = ? AND content_hash = ?",
+                           (now, now, key, version, content_hash))
+        self._conn.commit()
+        return self._row_to_article(row)
+
+    def put(self, url: str, version: str, content_hash: str, html: Optional[str],
+            content: Optional[str], date: Optional[str], analysis: Dict) -> None:
+        html_blob = zlib.compress(html.encode("utf-8")) if html else None
+        analysis_json = json.dumps(analysis, ensure_ascii=False)
+        size = len(html_blob or b"") + len((content or "").encode("utf-8")) + len(analysis_json.encode("utf-8"))
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO articles (url, version, content_hash, html, content, date, analysis, fetched_at, last_access, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (normalize_url(url), version, content_hash, html_blob, content, date, analysis_json, now, now, size))
+        self._conn.commit()
+
+    def evict(self) -> int:
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la taille maximale."""
+        removed = self._conn.execute("DELETE FROM articles WHERE fetched_at <= ?",
+                                     (time.time() - self.ttl_seconds,)).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            victims = []
+            for url, version, content_hash, size in self._conn.execute(
+                    "SELECT url, version, content_hash, size FROM articles ORDER BY last_access ASC"):
+                if excess <= 0:
+                    break
+                victims.append((url, version, content_hash))
+                excess -= size
+            self._conn.executemany("DELETE FROM articles WHERE url = ? AND version = ? AND content_hash = ?", victims)
+            removed += len(victims)
+        self._conn.commit()
+        return removed
+
+    def stats(self) -> Dict:
+        total = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.revalidated) / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,122 @@
+# condense.py
+"""
+Mise au format d'un article pour le prompt d'analyse, dans un budget de tokens.
+
+Les tokens sont comptés localement : avec `tiktoken` s'il est installé, sinon avec un
+découpage approché (mots coupés tous les 4 caractères, ponctuation à part), proche des
+tokenizers BPE sur l'anglais et un peu plus prudent sur le français. Un article
+trop long garde son chapeau, sa conclusion et, entre les deux, ses paragraphes les plus
+saillants (termes fréquents dans l'article, chiffres), dans leur ordre d'origine. Le texte
+renvoyé, séparateurs et marques d'ellipse compris, ne dépasse jamais le budget.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from relevance import tokenize
+
+LLM_ARTICLE_TOKEN_BUDGET = int(os.getenv("SCRAAPY_LLM_ARTICLE_TOKEN_BUDGET", "1500"))
+
+# Parts du budget réservées au début et à la fin de l'article
+_LEAD_SHARE = 0.3
+_ENDING_SHARE = 0.15
+_GAP = "[…]"
+_ELLIPSIS = " …"
+_PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+_NUMBER = re.compile(r"\d")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Chargé au premier comptage : tiktoken peut devoir télécharger son vocabulaire
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # tiktoken absent, ou vocabulaire indisponible hors ligne
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_PIECE.findall(text))
+
+
+def _cut(text: str, budget: int) -> str:
+    # Coupe au dernier mot qui tient dans le budget, marque d'ellipse comprise
+    # (approximation proportionnelle, puis ajustement)
+    total = count_tokens(text)
+    if total <= budget:
+        return text
+    words = text.split()
+    keep = int(len(words) * budget / max(1, total))
+    while keep > 0 and count_tokens(" ".join(words[:keep]) + _ELLIPSIS) > budget:
+        keep = min(keep - 1, int(keep * 0.9))
+    if keep > 0:
+        return " ".join(words[:keep]) + _ELLIPSIS
+    # Premier mot trop long à lui seul (URL, texte sans espaces) : coupe au caractère
+    chars = int(len(words[0]) * budget / max(1, count_tokens(words[0]))) if words else 0
+    while chars > 0 and count_tokens(words[0][:chars] + _ELLIPSIS) > budget:
+        chars = min(chars - 1, int(chars * 0.9))
+    return words[0][:chars] + _ELLIPSIS if chars > 0 else ""
+
+
+def _salience(paragraph: str, frequencies: Counter) -> float:
+    terms = tokenize(paragraph)
+    if not terms:
+        return 0.0
+    score = sum(frequencies[term] for term in set(terms)) / math.sqrt(len(terms))
+    # Les chiffres (montants, dates, parts de marché) portent souvent l'essentiel
+    return score * (1.2 if _NUMBER.search(paragraph) else 1.0)
+
+
+def _assemble(kept: Dict[int, str]) -> str:
+    parts, previous = [], -1
+    for index in sorted(kept):
+        if index != previous + 1:
+            parts.append(_GAP)
+        parts.append(kept[index])
+        previous = index
+    return "\n".join(parts)
+
+
+def condense(text: str, budget: int = LLM_ARTICLE_TOKEN_BUDGET) -> Tuple[str, int, int]:
+    """Renvoie le texte ramené au budget, son nombre de tokens et celui du texte d'origine."""
+    original = count_tokens(text)
+    if original <= budget:
+        return text, original, original
+    paragraphs: List[str] = [p.strip() for p in text.split("\n") if p.strip()]
+    if len(paragraphs) < 3:
+        condensed = _cut(text, budget)
+        return condensed, count_tokens(condensed), original
+
+    sizes = [count_tokens(p) for p in paragraphs]
+    # Chaque paragraphe gardé peut être précédé d'un saut de ligne et d'une marque d'ellipse
+    separator = count_tokens("\n" + _GAP + "\n")
+    kept = {0: _cut(paragraphs[0], int(budget * _LEAD_SHARE)),
+            len(paragraphs) - 1: _cut(paragraphs[-1], int(budget * _ENDING_SHARE))}
+    remaining = budget - sum(count_tokens(p) for p in kept.values()) - separator
+
+    frequencies = Counter(tokenize(text))
+    middle = sorted(range(1, len(paragraphs) - 1), key=lambda i: _salience(paragraphs[i], frequencies), reverse=True)
+    for index in middle:
+        if sizes[index] + separator <= remaining:
+            kept[index] = paragraphs[index]
+            remaining -= sizes[index] + separator
+
+    condensed = _assemble(kept)
+    # Les tokens ne s'additionnent pas exactement d'un morceau à l'autre : on retire les paragraphes
+    # du milieu les moins saillants jusqu'à tenir dans le budget, puis on coupe en dernier recours
+    dropped = [index for index in reversed(middle) if index in kept]
+    while count_tokens(condensed) > budget and dropped:
+        del kept[dropped.pop(0)]
+        condensed = _assemble(kept)
+    if count_tokens(condensed) > budget:
+        condensed = _cut(condensed, budget)
+    return condensed, count_tokens(condensed), original
+
@@ -0,0 +1,86 @@
+# dedup.py
+"""
+Détection des quasi-doublons entre articles (même événement, URLs et titres différents).
+
+Chaque document est réduit à une signature MinHash sur ses trigrammes de mots, puis
+indexé par LSH (bandes de la signature) : un document n'est comparé qu'aux documents qui
+partagent au moins une bande avec lui, ce qui évite la comparaison de toutes les paires et
+tient sur des milliers d'articles. L'index est incrémental : chaque article est classé
+(nouvelle histoire ou quasi-doublon d'un représentant déjà indexé) dès son extraction.
+"""
+
+import hashlib
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEDUP_THRESHOLD = float(os.getenv("SCRAAPY_DEDUP_THRESHOLD", "0.5"))
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Seuls les premiers caractères du texte servent à la signature : le chapeau suffit à reconnaître un événement
+MAX_TEXT_CHARS = 3000
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.int32).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int32).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    shingles = _shingles(text)
+    if not shingles:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                          for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+
+def document_signature(text: str) -> np.ndarray:
+    return minhash_signature(text[:MAX_TEXT_CHARS])
+
+
+def encode_signature(signature: np.ndarray) -> bytes:
+    return signature.astype(np.uint64).tobytes()
+
+
+def decode_signature(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint64)
+
+
+class NearDuplicateIndex:
+    """Représentants des histoires déjà vues, indexés par bandes LSH."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._signatures: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+
+    def add(self, signature: np.ndarray) -> Optional[int]:
+        """Rang du représentant quasi identique à cette signature ; sinon le document devient un représentant (None)."""
+        keys = [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+        candidates: Set[int] = set()
+        for key in keys:
+            candidates.update(self._buckets.get(key, ()))
+        # Le plus ancien représentant assez proche l'emporte
+        for index in sorted(candidates):
+            if float(np.mean(self._signatures[index] == signature)) >= self.threshold:
+                return index
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets[key].append(index)
+        return None
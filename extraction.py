@@ -0,0 +1,99 @@
+# extraction.py
+"""
+Extraction du texte et de la date des articles, hors de la boucle d'événements.
+
+Chaque page est analysée une seule fois : `trafilatura.bare_extraction` construit un
+arbre HTML unique dont il tire le texte et les métadonnées. Avant ce travail coûteux,
+une sonde rapide (balises retirées par expression régulière) écarte les pages dont le
+texte visible est trop court pour donner un article exploitable.
+
+L'extraction tourne dans un pool de processus partagé entre les runs, pour occuper
+tous les cœurs ; `SCRAAPY_EXTRACT_MODE=thread` revient à un pool de threads.
+Ce module ne doit rien importer de lourd : les processus du pool le rechargent, et
+trafilatura n'est chargé qu'à la première extraction (ou au préchauffage du pool).
+"""
+
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+EXTRACT_CONCURRENCY = int(os.getenv("SCRAAPY_EXTRACT_CONCURRENCY", str(os.cpu_count() or 4)))
+EXTRACT_MODE = os.getenv("SCRAAPY_EXTRACT_MODE", "process").lower()
+# En dessous de ce nombre de caractères, un article n'est pas envoyé au LLM
+MIN_CONTENT_CHARS = 250
+
+_STRIP_BLOCKS = re.compile(r"<(script|style|noscript|template|svg)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"\s+")
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+
+
+def has_enough_text(html: str, min_chars: int = MIN_CONTENT_CHARS) -> bool:
+    """Sonde rapide : le texte visible de la page est-il assez long pour contenir un article ?"""
+    if len(html) < min_chars:
+        return False
+    visible = _SPACES.sub(" ", _TAG.sub(" ", _STRIP_BLOCKS.sub(" ", html)))
+    return len(visible.strip()) >= min_chars
+
+
+def extract_document(html: str) -> Tuple[Optional[str], str]:
+    """Texte principal et date de publication, tirés d'une seule analyse du document."""
+    if not has_enough_text(html):
+        return None, "N/A"
+    import trafilatura
+    document = trafilatura.bare_extraction(html, favor_recall=True, with_metadata=True)
+    if document is None:
+        return None, "N/A"
+    # trafilatura < 2 renvoie un dict, les versions récentes un objet Document
+    if isinstance(document, dict):
+        content, date = document.get("text"), document.get("date")
+    else:
+        content, date = document.text, document.date
+    return content or None, date or "N/A"
+
+
+def get_extract_pool() -> Executor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if EXTRACT_MODE == "process":
+                # "spawn" : un fork depuis un processus multithread (boucle asyncio, httpx) n'est pas sûr
+                _pool = ProcessPoolExecutor(max_workers=EXTRACT_CONCURRENCY, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pool = ThreadPoolExecutor(max_workers=EXTRACT_CONCURRENCY, thread_name_prefix="extract")
+        return _pool
+
+
+def _load_extractor() -> None:
+    import trafilatura  # noqa: F401
+
+
+def warm_extract_pool() -> None:
+    """Lance les processus du pool à l'avance et y charge trafilatura, pour que le premier run ne paie pas leur démarrage."""
+    pool = get_extract_pool()
+    for future in [pool.submit(_load_extractor) for _ in range(EXTRACT_CONCURRENCY)]:
+        future.result()
+
+
+def reset_extract_pool(broken: Optional[Executor] = None) -> None:
+    """Abandonne le pool courant (processus mort, extraction bloquée) ; le suivant est recréé à la demande.
+
+    Avec `broken`, le pool n'est abandonné que s'il est encore le pool courant : les extractions
+    en échec sur un même pool cassé ne détruisent pas le pool neuf créé par la première d'entre elles.
+    """
+    global _pool
+    with _pool_lock:
+        if broken is not None and _pool is not broken:
+            return
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(reset_extract_pool)
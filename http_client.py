@@ -0,0 +1,176 @@
+# http_client.py
+"""
+Couche HTTP partagée par le scraping des pages d'accueil et le téléchargement des articles.
+
+Un seul `httpx.AsyncClient` par run (keep-alive, HTTP/2 si `h2` est installé, gzip et
+brotli si `brotli` est installé), une limite de connexions simultanées par hôte, et des
+requêtes conditionnelles (ETag / Last-Modified) appuyées sur un magasin local de
+validateurs. Une réponse 304 renvoie le corps déjà connu ainsi que le résultat de son
+analyse précédente (`parsed`), ce qui évite de le ré-analyser.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from cache import normalize_url
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("SCRAAPY_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("SCRAAPY_HTTP_PER_HOST_LIMIT", "6"))
+HTTP_TIMEOUT = float(os.getenv("SCRAAPY_HTTP_TIMEOUT", "30"))
+HTTP_MAX_BYTES = int(float(os.getenv("SCRAAPY_HTTP_MAX_MB", "20")) * 1024 * 1024)
+VALIDATOR_STORE_PATH = os.getenv("SCRAAPY_VALIDATOR_STORE_PATH", "scraapy_http.sqlite3")
+VALIDATOR_TTL_SECONDS = float(os.getenv("SCRAAPY_VALIDATOR_TTL_DAYS", "7")) * 86400
+
+USER_AGENT = "Mozilla/5.0"
+_HTML_TYPES = ("html", "xml")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    text: Optional[str]
+    bytes_received: int
+    not_modified: bool = False
+    parsed: Any = None
+    # Corps ignoré sur la foi des en-têtes : "content_type" ou "too_small"
+    rejected: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.text is not None and (self.not_modified or 200 <= self.status < 300)
+
+
+class ValidatorStore:
+    def __init__(self, path: str = VALIDATOR_STORE_PATH, ttl_seconds: float = VALIDATOR_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                parsed TEXT,
+                updated_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT etag, last_modified, body, parsed FROM validators WHERE url = ?",
+                                 (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, parsed = row
+        return {"etag": etag, "last_modified": last_modified, "body": zlib.decompress(body).decode("utf-8"),
+                "parsed": json.loads(parsed) if parsed else None}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO validators (url, etag, last_modified, body, parsed, updated_at) VALUES (?, ?, ?, ?, NULL, ?)",
+            (normalize_url(url), etag, last_modified, zlib.compress(body.encode("utf-8")), time.time()))
+        self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        self._conn.execute("UPDATE validators SET updated_at = ? WHERE url = ?", (time.time(), normalize_url(url)))
+        self._conn.commit()
+
+    def set_parsed(self, url: str, parsed: Any) -> None:
+        self._conn.execute("UPDATE validators SET parsed = ? WHERE url = ?",
+                           (json.dumps(parsed, ensure_ascii=False), normalize_url(url)))
+        self._conn.commit()
+
+    def prune(self) -> None:
+        self._conn.execute("DELETE FROM validators WHERE updated_at <= ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SharedHttpClient:
+    def __init__(self, validators: Optional[ValidatorStore] = None, per_host_limit: int = HTTP_PER_HOST_LIMIT):
+        self.validators = validators
+        self._per_host_limit = per_host_limit
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self._per_host_limit))
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, pool=None),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+
+    async def __aenter__(self) -> "SharedHttpClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        if self.validators:
+            self.validators.prune()
+            self.validators.close()
+
+    async def fetch(self, url: str, timeout: Optional[httpx.Timeout] = None, html_only: bool = False,
+                    min_bytes: int = 0) -> FetchResult:
+        known = self.validators.get(url) if self.validators else None
+        headers = {}
+        if known and known["etag"]:
+            headers["If-None-Match"] = known["etag"]
+        if known and known["last_modified"]:
+            headers["If-Modified-Since"] = known["last_modified"]
+
+        async with self._host_semaphores[urlparse(url).netloc]:
+            kwargs = {"headers": headers} if timeout is None else {"headers": headers, "timeout": timeout}
+            async with self._client.stream("GET", url, **kwargs) as response:
+                declared = int(response.headers.get("Content-Length") or 0)
+                if declared > HTTP_MAX_BYTES:
+                    return FetchResult(url=url, status=response.status_code, text=None, bytes_received=0)
+                # Rejets précoces, avant de lire le corps (PDF, images, pages quasi vides)
+                if 200 <= response.status_code < 300:
+                    content_type = response.headers.get("Content-Type", "").lower()
+                    if html_only and content_type and not any(kind in content_type for kind in _HTML_TYPES):
+                        return FetchResult(url=url, status=response.status_code, text=None, bytes_received=0,
+                                           rejected="content_type")
+                    if "Content-Length" in response.headers and declared < min_bytes:
+                        return FetchResult(url=url, status=response.status_code, text=None, bytes_received=0,
+                                           rejected="too_small")
+                await response.aread()
+
+        bytes_received = int(response.num_bytes_downloaded)
+        if response.status_code == 304 and known:
+            self.validators.touch(url)
+            return FetchResult(url=url, status=304, text=known["body"], bytes_received=bytes_received,
+                               not_modified=True, parsed=known["parsed"])
+        if not 200 <= response.status_code < 300:
+            return FetchResult(url=url, status=response.status_code, text=None, bytes_received=bytes_received)
+
+        text = response.text
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if self.validators and (etag or last_modified):
+            self.validators.put(url, etag, last_modified, text)
+        return FetchResult(url=url, status=response.status_code, text=text, bytes_received=bytes_received)
+
+    def remember_parsed(self, url: str, parsed: Any) -> None:
+        """Associe au corps mémorisé le résultat de son analyse, réutilisé sur les réponses 304."""
+        if self.validators:
+            self.validators.set_parsed(url, parsed)
@@ -0,0 +1,201 @@
+# jobs.py
+"""
+File de tâches de veille pour l'API : les requêtes sont mises en file, exécutées par
+un pool de workers borné et leurs résultats conservés dans SQLite.
+
+Deux requêtes identiques (même sujet, même mode) en cours d'exécution sont fusionnées
+en un seul run : la seconde reçoit l'identifiant de la première.
+
+Plusieurs processus (API, interface Streamlit) peuvent partager le même fichier : chaque job
+porte un bail (propriétaire et battement de cœur renouvelé par son processus). Seuls les jobs
+dont le bail a expiré, parce que leur processus s'est arrêté, sont repris par un autre.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from scraap import run_veile_workflow
+
+JOB_WORKERS = int(os.getenv("SCRAAPY_JOB_WORKERS", "2"))
+JOB_DB_PATH = os.getenv("SCRAAPY_JOB_DB_PATH", "scraapy_jobs.sqlite3")
+# Un job dont le processus n'a pas donné signe de vie depuis JOB_LEASE secondes est repris
+JOB_LEASE_SECONDS = float(os.getenv("SCRAAPY_JOB_LEASE", "60"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _job_key(query: str, incremental: bool) -> Tuple[str, bool]:
+    return " ".join(query.lower().split()), incremental
+
+
+class JobStore:
+    def __init__(self, path: str = JOB_DB_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                incremental INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                heartbeat REAL
+            )""")
+        self._conn.commit()
+
+    def create(self, query: str, incremental: bool, owner: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn.execute("INSERT INTO jobs (id, query, incremental, status, created_at, owner, heartbeat) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)", (job_id, query, int(incremental), QUEUED, now, owner, now))
+        self._conn.commit()
+        return job_id
+
+    def mark_running(self, job_id: str) -> None:
+        self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+        self._conn.commit()
+
+    def finish(self, job_id: str, result: Optional[Dict], error: Optional[str]) -> None:
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+            (FAILED if error else DONE, time.time(),
+             json.dumps(result, ensure_ascii=False, default=str) if result is not None else None, error, job_id))
+        self._conn.commit()
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT id, query, incremental, status, created_at, started_at, finished_at, result, error FROM jobs WHERE id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row[0], "query": row[1], "incremental": bool(row[2]), "status": row[3],
+            "created_at": row[4], "started_at": row[5], "finished_at": row[6], "error": row[8],
+        }
+        if include_result and row[7] is not None:
+            job["result"] = json.loads(row[7])
+        return job
+
+    def claim_expired(self, owner: str, lease_seconds: float = JOB_LEASE_SECONDS) -> List[Tuple[str, str, bool]]:
+        """Prend en charge les jobs inachevés dont le bail a expiré (processus arrêté) ; renvoie ceux repris."""
+        now = time.time()
+        # Transaction d'écriture : deux processus qui démarrent ensemble ne reprennent pas le même job
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT id, query, incremental FROM jobs WHERE status IN (?, ?) AND (heartbeat IS NULL OR heartbeat < ?) "
+                "ORDER BY created_at", (QUEUED, RUNNING, now - lease_seconds)).fetchall()
+            self._conn.executemany("UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ?",
+                                   [(owner, now, job_id) for job_id, _, _ in rows])
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        return [(job_id, query, bool(incremental)) for job_id, query, incremental in rows]
+
+    def heartbeat(self, owner: str) -> None:
+        self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                           (time.time(), owner, QUEUED, RUNNING))
+        self._conn.commit()
+
+    def release(self, owner: str) -> None:
+        """Bail rendu à l'arrêt : les jobs inachevés peuvent être repris aussitôt."""
+        self._conn.execute("UPDATE jobs SET heartbeat = NULL WHERE owner = ? AND status IN (?, ?)", (owner, QUEUED, RUNNING))
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class JobManager:
+    def __init__(self, store: Optional[JobStore] = None, max_workers: int = JOB_WORKERS):
+        self._store = store
+        self._max_workers = max_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        # Propriétaire des baux de ce gestionnaire : hôte, processus, instance
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Runs en file ou en cours, par clé (requête normalisée, mode) -> identifiant du job
+        self._in_flight: Dict[Tuple[str, bool], str] = {}
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._recover()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self._max_workers)]
+        self._heartbeat = asyncio.create_task(self._renew_leases())
+        print(f"🧵 [JOBS] {self._max_workers} workers démarrés.")
+
+    async def stop(self) -> None:
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers, self._heartbeat = [], None
+        self.store.release(self.owner)
+
+    def _recover(self) -> None:
+        # Jobs interrompus par l'arrêt de leur processus (celui-ci ou un autre) : relancés ici
+        for job_id, query, incremental in self.store.claim_expired(self.owner):
+            print(f"🧵 [JOBS] Reprise du job {job_id} ('{query}')")
+            self._in_flight.setdefault(_job_key(query, incremental), job_id)
+            self._queue.put_nowait((job_id, query, incremental))
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                self.store.heartbeat(self.owner)
+                self._recover()
+            except sqlite3.Error as e:
+                print(f"❌ [JOBS] Renouvellement des baux impossible : {e}")
+
+    def submit(self, query: str, incremental: bool = False) -> Dict[str, Any]:
+        key = _job_key(query, incremental)
+        existing = self._in_flight.get(key)
+        if existing:
+            return {**self.store.get(existing, include_result=False), "coalesced": True}
+        job_id = self.store.create(query, incremental, self.owner)
+        self._in_flight[key] = job_id
+        self._queue.put_nowait((job_id, query, incremental))
+        return {**self.store.get(job_id, include_result=False), "coalesced": False}
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id, include_result=include_result)
+        if job and job["status"] == QUEUED:
+            job["queue_size"] = self._queue.qsize() if self._queue else 0
+        return job
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id, query, incremental = await self._queue.get()
+            try:
+                print(f"🧵 [JOBS] Worker {index} : lancement du job {job_id} ('{query}')")
+                self.store.mark_running(job_id)
+                result = await run_veile_workflow(query, incremental=incremental)
+                self.store.finish(job_id, result, result.get("error_message"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ [JOBS] Erreur du job {job_id} : {e}")
+                self.store.finish(job_id, None, str(e))
+            finally:
+                self._in_flight.pop(_job_key(query, incremental), None)
+                self._queue.task_done()
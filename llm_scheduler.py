@@ -0,0 +1,228 @@
+# llm_scheduler.py
+"""
+Ordonnanceur des appels au LLM : débit, concurrence adaptative, reprises et échéance.
+
+Chaque appel passe par deux seaux à jetons (requêtes/min et tokens/min), puis par une
+limite de concurrence ajustée en AIMD : +1/limite à chaque succès rapide, division par
+deux sur un 429, un délai dépassé ou une erreur serveur (au plus une fois par période de
+refroidissement), réduction légère quand la latence s'envole. Les erreurs transitoires
+sont reprises avec un backoff exponentiel à gigue complète, en respectant `Retry-After`.
+Passé l'échéance du run, les appels restants lèvent `RunDeadlineExceeded` au lieu d'attendre.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("SCRAAPY_LLM_RPM", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("SCRAAPY_LLM_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("SCRAAPY_LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_ATTEMPTS = int(os.getenv("SCRAAPY_LLM_MAX_ATTEMPTS", "4"))
+LLM_CALL_TIMEOUT = float(os.getenv("SCRAAPY_LLM_CALL_TIMEOUT", "120"))
+LLM_BACKOFF_BASE = float(os.getenv("SCRAAPY_LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("SCRAAPY_LLM_BACKOFF_MAX", "30"))
+
+# Rafale autorisée par les seaux : dix secondes de débit
+_BURST_SECONDS = 10.0
+# Latence (normalisée par millier de tokens) au-delà de laquelle la concurrence est réduite
+_LATENCY_TOLERANCE = 3.0
+_THROTTLE_OUTCOMES = ("rate_limit", "timeout", "server_error")
+
+
+class RunDeadlineExceeded(Exception):
+    """L'échéance du run est atteinte : l'appel n'est pas (ou plus) tenté."""
+
+
+def _check_deadline(deadline: Optional[float], wait: float = 0.0) -> None:
+    if deadline is not None and time.monotonic() + wait >= deadline:
+        raise RunDeadlineExceeded("Échéance du run atteinte")
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """Nature d'une erreur reprise ("rate_limit", "timeout", "server_error", "connection"), None sinon."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    name = type(error).__name__.lower()
+    if status == 429 or "ratelimit" in name or "rate limit" in str(error).lower():
+        return "rate_limit"
+    if isinstance(error, TimeoutError) or "timeout" in name:
+        return "timeout"
+    if isinstance(status, int) and status >= 500:
+        return "server_error"
+    if "connection" in name:
+        return "connection"
+    return None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * _BURST_SECONDS)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float, deadline: Optional[float] = None) -> None:
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        # Verrou tenu pendant l'attente : les appels sont servis dans l'ordre d'arrivée
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                wait = (amount - self._level) / self.rate
+                _check_deadline(deadline, wait)
+                await asyncio.sleep(wait)
+
+    def adjust(self, delta: float) -> None:
+        """Corrige l'estimation après coup ; le niveau peut devenir négatif (dette remboursée par l'attente)."""
+        if self.rate > 0:
+            self._refill()
+            self._level -= delta
+
+
+class AdaptiveLimit:
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = LLM_MAX_CONCURRENCY):
+        self.minimum, self.maximum = minimum, max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._latency: Optional[float] = None
+        self._round_trip = 1.0
+        self._last_decrease = 0.0
+
+    async def acquire(self, deadline: Optional[float] = None) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=_remaining(deadline))
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled():
+                # Place accordée au moment même de l'abandon : on la rend
+                self._release_slot()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if isinstance(error, asyncio.TimeoutError):
+                raise RunDeadlineExceeded("Échéance du run atteinte") from None
+            raise
+
+    def release(self, outcome: str, latency: Optional[float] = None, duration: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if outcome == "ok" and duration is not None:
+            self._round_trip = 0.8 * self._round_trip + 0.2 * duration
+        if outcome in _THROTTLE_OUTCOMES:
+            self._decrease(now, 0.5)
+        elif outcome == "ok" and latency is not None:
+            if self._latency is not None and latency > _LATENCY_TOLERANCE * self._latency:
+                self._decrease(now, 0.9)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        self._release_slot()
+
+    def _decrease(self, now: float, factor: float) -> None:
+        # Une seule baisse par aller-retour : les échecs simultanés d'une même rafale ne comptent qu'une fois
+        if now - self._last_decrease >= self._round_trip:
+            self.limit = max(self.minimum, self.limit * factor)
+            self._last_decrease = now
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class LLMScheduler:
+    def __init__(self, initial_concurrency: int, deadline: Optional[float] = None,
+                 usage_of: Callable[[Any], Optional[int]] = lambda response: None,
+                 on_retry: Callable[[str], None] = lambda reason: None,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 max_attempts: int = LLM_MAX_ATTEMPTS):
+        self.deadline = deadline
+        self._usage_of = usage_of
+        self._on_retry = on_retry
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._limit = AdaptiveLimit(initial_concurrency)
+        self._max_attempts = max(1, max_attempts)
+        self.throttled = 0
+        self.skipped = 0
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    async def call(self, invoke: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        try:
+            return await self._call(invoke, estimated_tokens)
+        except RunDeadlineExceeded:
+            self.skipped += 1
+            raise
+
+    async def _call(self, invoke: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        for attempt in range(1, self._max_attempts + 1):
+            _check_deadline(self.deadline)
+            await self._requests.acquire(1, self.deadline)
+            await self._tokens.acquire(estimated_tokens, self.deadline)
+            await self._limit.acquire(self.deadline)
+            started, outcome, error = time.monotonic(), "error", None
+            remaining = _remaining(self.deadline)
+            try:
+                timeout = LLM_CALL_TIMEOUT if remaining is None else min(LLM_CALL_TIMEOUT, remaining)
+                response = await asyncio.wait_for(invoke(), timeout=timeout)
+                outcome = "ok"
+            except Exception as e:
+                error, outcome = e, classify_error(e) or "error"
+            finally:
+                # Latence ramenée au millier de tokens, pour comparer appels simples et lots
+                duration = time.monotonic() - started
+                self._limit.release(outcome, duration / max(1.0, estimated_tokens / 1000), duration)
+
+            if error is None:
+                used = self._usage_of(response)
+                if used:
+                    self._tokens.adjust(used - estimated_tokens)
+                return response
+            if outcome == "timeout" and self.expired:
+                raise RunDeadlineExceeded("Échéance du run atteinte pendant l'appel") from error
+            if outcome == "error" or attempt == self._max_attempts:
+                raise error
+            if outcome in _THROTTLE_OUTCOMES:
+                self.throttled += 1
+            self._on_retry(outcome)
+            delay = max(_retry_after(error) or 0.0, random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** (attempt - 1))))
+            _check_deadline(self.deadline, delay)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        return {"concurrency_limit": round(self._limit.limit, 2), "throttled": self.throttled, "skipped": self.skipped}
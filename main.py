@@ -1,68 +1,272 @@
+import asyncio
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import streamlit as st
 import pandas as pd
-import asyncio # Import nécessaire pour gérer l'asynchronisme
+import streamlit as st
+
+from jobs import DONE, FAILED, QUEUED, JobManager
+
+PAGE_SIZES = (10, 25, 50, 100)
+# Intervalle de rafraîchissement de l'avancement d'une veille en cours, en secondes
+POLL_SECONDS = 2
+# À score égal, la proximité avec la requête (BM25, relevance.py) départage les articles
+SORT_COLUMNS = {"Score": ["score", "relevance"], "Date": "date", "Source": "source", "Titre": "title"}
+
+
+# --- Runs en arrière-plan ---
+class BackgroundJobs:
+    """File de jobs (jobs.py) sur une boucle d'événements dédiée, partagée par toutes les sessions.
+
+    Le script Streamlit ne fait que soumettre et consulter des jobs : il n'est jamais bloqué par
+    un run, et deux utilisateurs qui lancent la même veille suivent le même run.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="scraapy-jobs", daemon=True).start()
+        self._manager = JobManager()
+        asyncio.run_coroutine_threadsafe(self._manager.start(), self._loop).result()
+        # Le backend (graphe, prompts, client LLM) se charge pendant que l'utilisateur parcourt la page
+        self._loop.call_soon_threadsafe(self._warm)
+
+    def _warm(self) -> None:
+        from scraap import warm_backend
+        self._loop.run_in_executor(None, warm_backend)
+
+    def _call(self, function: Callable, *args) -> Any:
+        # La file asyncio du JobManager n'est manipulée que depuis sa boucle
+        async def call():
+            return function(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    def submit(self, query: str, incremental: bool = False) -> Dict[str, Any]:
+        return self._call(self._manager.submit, query, incremental)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Sans le résultat : interrogé toutes les POLL_SECONDS pendant le run
+        return self._call(self._manager.get, job_id, False)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._call(self._manager.get, job_id)
+
+
+@st.cache_resource(show_spinner=False)
+def get_background_jobs() -> BackgroundJobs:
+    return BackgroundJobs()
+
+
+@st.cache_resource(show_spinner=False)
+def get_run_history():
+    from scheduler import RunHistory
+    return RunHistory()
+
+
+# --- Chargement des résultats (mémoïsé) ---
+@st.cache_data(ttl=60, show_spinner=False)
+def load_latest_scheduled() -> Optional[Dict[str, Any]]:
+    """Dernier rapport planifié réussi (scheduler.py), relu au plus une fois par minute."""
+    run = get_run_history().latest()
+    if not run or not run.get("result"):
+        return None
+    return {"key": f"run:{run['id']}", "query": run["query"], "finished_at": run["started_at"] + run["duration_s"],
+            "result": run["result"]}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_job_result(job_id: str) -> Optional[Dict[str, Any]]:
+    # Appelé seulement sur un job terminé : son résultat ne change plus
+    job = get_background_jobs().get(job_id)
+    if not job:
+        return None
+    return {"key": f"job:{job_id}", "query": job["query"], "finished_at": job["finished_at"],
+            "result": job.get("result") or {"error_message": job.get("error")}}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def articles_frame(result_key: str, _articles: List[Dict[str, Any]]) -> pd.DataFrame:
+    # Le préfixe `_` exclut les articles du hachage : la clé du résultat suffit à identifier le tableau
+    rows = [{
+        "title": article.get("title"),
+        "source": article.get("source"),
+        "date": article.get("date"),
+        "score": article.get("score_pertinence"),
+        "relevance": article.get("relevance_score"),
+        "type": article.get("type_evenement"),
+        "url": article.get("url"),
+        "corroborating": len(article.get("corroborating_sources") or []),
+        "is_new": bool(article.get("is_new")),
+        "error": article.get("error"),
+        "resume_strategique": article.get("resume_strategique"),
+        "lecon_a_retenir": article.get("lecon_a_retenir"),
+        "impact_potentiel": article.get("impact_potentiel"),
+        "resume_neutre": article.get("resume_neutre"),
+    } for article in _articles]
+    frame = pd.DataFrame(rows, columns=["title", "source", "date", "score", "relevance", "type", "url", "corroborating",
+                                        "is_new", "error", "resume_strategique", "lecon_a_retenir", "impact_potentiel",
+                                        "resume_neutre"])
+    frame["date"] = pd.to_datetime(frame["date"], errors="coerce", utc=True).dt.tz_localize(None)
+    frame["score"] = pd.to_numeric(frame["score"], errors="coerce")
+    frame["relevance"] = pd.to_numeric(frame["relevance"], errors="coerce")
+    return frame
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def filtered_view(result_key: str, _frame: pd.DataFrame, sources: Tuple[str, ...], min_score: int,
+                  date_range: Tuple[date, ...], search: str, include_errors: bool,
+                  sort_by: str, ascending: bool) -> pd.DataFrame:
+    view = _frame
+    if not include_errors:
+        view = view[view["error"].isna()]
+    if sources:
+        view = view[view["source"].isin(sources)]
+    if min_score:
+        view = view[view["score"].fillna(0) >= min_score]
+    if len(date_range) == 2:
+        start, end = (pd.Timestamp(day) for day in date_range)
+        view = view[view["date"].isna() | view["date"].between(start, end + pd.Timedelta(days=1), inclusive="left")]
+    if search:
+        view = view[view["title"].fillna("").str.contains(search, case=False, regex=False)]
+    return view.sort_values(SORT_COLUMNS[sort_by], ascending=ascending, na_position="last", kind="stable")
+
+
+# --- Affichage ---
+@st.fragment(run_every=POLL_SECONDS)
+def job_progress(job_id: str) -> None:
+    # Seul ce fragment est réexécuté pendant l'attente ; la page entière l'est quand le job se termine
+    job = get_background_jobs().status(job_id)
+    if job is None:
+        st.warning("Veille introuvable.")
+        return
+    if job["status"] in (DONE, FAILED):
+        st.session_state["view"] = ("job", job_id)
+        st.session_state.pop("job_id", None)
+        st.rerun()
+    if job["status"] == QUEUED:
+        st.info(f"⏳ Veille « {job['query']} » en file d'attente ({job.get('queue_size', 0)} job(s) en attente).")
+    else:
+        elapsed = time.time() - (job["started_at"] or job["created_at"])
+        st.info(f"🔄 Veille « {job['query']} » en cours depuis {int(elapsed)} s : scraping et analyse des articles…")
+
+
+def render_articles(result_key: str, articles: List[Dict[str, Any]]) -> None:
+    frame = articles_frame(result_key, articles)
+    if frame.empty:
+        st.warning("Aucun article analysé.")
+        return
+
+    with st.container(border=True):
+        col_sources, col_score, col_dates = st.columns([2, 1, 1])
+        sources = col_sources.multiselect("Sources", sorted(frame["source"].dropna().unique()), key=f"{result_key}:sources")
+        min_score = col_score.slider("Score minimum", 0, 10, 0, key=f"{result_key}:score")
+        dates = frame["date"].dropna()
+        date_range = ()
+        if not dates.empty:
+            date_range = tuple(col_dates.date_input("Période", (dates.min().date(), dates.max().date()),
+                                                    key=f"{result_key}:dates"))
+        col_search, col_sort, col_order, col_errors = st.columns([2, 1, 1, 1])
+        search = col_search.text_input("Titre contient", key=f"{result_key}:search")
+        sort_by = col_sort.selectbox("Trier par", list(SORT_COLUMNS), key=f"{result_key}:sort")
+        ascending = col_order.radio("Ordre", ["Décroissant", "Croissant"], horizontal=True,
+                                    key=f"{result_key}:order") == "Croissant"
+        include_errors = col_errors.checkbox("Inclure les erreurs", key=f"{result_key}:errors")
+
+    view = filtered_view(result_key, frame, tuple(sources), min_score, date_range, search.strip(),
+                         include_errors, sort_by, ascending)
+
+    col_count, col_size, col_page = st.columns([2, 1, 1])
+    page_size = col_size.selectbox("Articles par page", PAGE_SIZES, key=f"{result_key}:page_size")
+    pages = max(1, -(-len(view) // page_size))
+    page = col_page.number_input("Page", 1, pages, 1, key=f"{result_key}:page")
+    col_count.markdown(f"**{len(view)}** article(s) sur {len(frame)} — page {page}/{pages}")
+    page_view = view.iloc[(page - 1) * page_size: page * page_size]
+
+    selection = st.dataframe(
+        page_view[["title", "source", "date", "score", "type", "corroborating", "url"]],
+        hide_index=True, width="stretch", on_select="rerun", selection_mode="single-row",
+        column_config={
+            "title": st.column_config.TextColumn("Titre", width="large"),
+            "source": "Source",
+            "date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+            "score": st.column_config.ProgressColumn("Score", min_value=0, max_value=10, format="%d"),
+            "type": "Type",
+            "corroborating": st.column_config.NumberColumn("Sources concordantes"),
+            "url": st.column_config.LinkColumn("Lien", display_text="Ouvrir"),
+        },
+        key=f"{result_key}:table",
+    )
+    selected_rows = selection.selection.rows if selection else []
+    if selected_rows:
+        article = page_view.iloc[selected_rows[0]]
+        st.subheader(article["title"])
+        if article["error"]:
+            st.error(article["error"])
+        for label, column in (("🎯 Résumé stratégique", "resume_strategique"), ("💡 Leçon à retenir", "lecon_a_retenir"),
+                              ("📈 Impact potentiel", "impact_potentiel"), ("📰 Résumé neutre", "resume_neutre")):
+            if article[column]:
+                st.markdown(f"**{label} :** {article[column]}")
+    else:
+        st.caption("Sélectionnez une ligne pour afficher l'analyse de l'article.")
+
+
+def render_result(loaded: Dict[str, Any], origin: str) -> None:
+    result = loaded["result"]
+    finished = datetime.fromtimestamp(loaded["finished_at"]).strftime("%d/%m/%Y %H:%M") if loaded["finished_at"] else "?"
+    st.caption(f"{origin} — requête « {loaded['query']} » — terminé le {finished}")
+    if result.get("error_message"):
+        st.error(f"❌ Une erreur est survenue lors du traitement : {result['error_message']}")
+        return
+    if result.get("final_report") and st.toggle("Afficher le rapport de synthèse complet", key=f"{loaded['key']}:report"):
+        # Le rapport Markdown peut être long : il n'est rendu qu'à la demande
+        st.markdown(result["final_report"])
+    render_articles(loaded["key"], result.get("analyzed_articles") or [])
 
-# On importe directement la fonction du backend
-from scraap import run_veile_workflow
 
 # --- Configuration de la Page ---
 st.set_page_config(layout="wide", page_title="SCRAAPY - Veille Automatisée")
 
-# --- Initialisation de l'état (inchangé) ---
-if "final_state" not in st.session_state:
-    st.session_state["final_state"] = None
-
-# --- Barre Latérale (inchangée) ---
+# --- Barre Latérale ---
 with st.sidebar:
     st.image("https://img.icons8.com/plasticine/100/bot.png", width=80)
     st.markdown("## SCRAAPY")
     st.markdown("### Votre Outil de Veille")
-    
+
     custom_query = st.text_input(
-        "Quel est le sujet de votre veille ?", 
+        "Quel est le sujet de votre veille ?",
         "Tendances en technologie actuellement"
     )
-    
+    incremental = st.checkbox("Seulement les nouveaux articles", help="Mode incrémental : les articles déjà vus ne sont pas réanalysés.")
+
     st.markdown("---")
-    
-    # =========================================================================
-    # === CORRECTION : Le bouton appelle maintenant le backend directement    ===
-    # ===            en utilisant asyncio.run() pour gérer l'asynchronisme  ===
-    # =========================================================================
-    if st.button("🚀 Lancer la Veille", use_container_width=True):
-        with st.spinner("Lancement du scraping et de l'analyse... Le traitement peut prendre une minute..."):
-            try:
-                # C'EST LA LIGNE MAGIQUE : on lance la fonction async depuis notre script sync
-                final_state_result = asyncio.run(run_veile_workflow(custom_query))
-                
-                # Stocker le résultat et rafraîchir la page
-                st.session_state["final_state"] = final_state_result
-                st.rerun()
-
-            except Exception as e:
-                # Gérer les erreurs qui pourraient survenir pendant l'exécution
-                st.error(f"Une erreur critique est survenue durant l'exécution : {e}")
-                st.session_state["final_state"] = {"error_message": str(e)}
+
+    # Le run part en arrière-plan : la page reste utilisable et suit son avancement
+    if st.button("🚀 Lancer la Veille", width="stretch", disabled="job_id" in st.session_state):
+        job = get_background_jobs().submit(custom_query, incremental)
+        st.session_state["job_id"] = job["job_id"]
+        if job["coalesced"]:
+            st.toast("Une veille identique est déjà en cours : vous suivez son avancement.")
+    if st.button("🗂️ Dernier rapport planifié", width="stretch"):
+        st.session_state["view"] = ("scheduled", None)
 
 # --- Affichage Principal ---
 st.title("🤖 SCRAAPY : Votre Assistant de Veille Intelligente")
-final_state = st.session_state.get("final_state")
-
-if not final_state:
-    st.info("👋 Bienvenue ! Indiquez le sujet de votre veille et cliquez sur 'Lancer la Veille'.")
-    st.stop()
-
-# --- Affichage des Résultats (inchangé) ---
-# Le reste de votre code d'affichage est parfait
-if final_state.get("error_message"):
-    st.error(f"❌ Une erreur est survenue lors du traitement : {final_state['error_message']}")
-
-elif final_state.get("final_report"):
-    st.success("✅ Veille terminée avec succès !")
-    st.subheader("📊 Rapport de Synthèse")
-    st.markdown(final_state["final_report"])
-    
-    # ... (le reste de votre code d'affichage des articles est bon) ...
+
+if "job_id" in st.session_state:
+    job_progress(st.session_state["job_id"])
+
+kind, job_id = st.session_state.get("view", ("scheduled", None))
+if kind == "job":
+    loaded = load_job_result(job_id)
+    if loaded:
+        render_result(loaded, "✅ Veille terminée")
+    else:
+        st.warning("Résultat de la veille introuvable.")
 else:
-    st.warning("Le processus a terminé, mais aucun rapport n'a été généré.")
\ No newline at end of file
+    # Par défaut, le dernier rapport planifié : aucun scraping pour simplement consulter la veille
+    loaded = load_latest_scheduled()
+    if loaded:
+        render_result(loaded, "🗂️ Dernier rapport planifié")
+    elif "job_id" not in st.session_state:
+        st.info("👋 Bienvenue ! Indiquez le sujet de votre veille et cliquez sur 'Lancer la Veille'.")
@@ -0,0 +1,206 @@
+# metrics.py
+"""
+Instrumentation locale du workflow, sans service externe.
+
+`RunMetrics` collecte les mesures d'un run (durée des nœuds, latence et taille des
+pages d'accueil, latences par étape et par article, tokens, reprises, cache) et les
+restitue sous forme de résumé structuré. Chaque mesure alimente aussi le registre
+global `REGISTRY`, exposé au format Prometheus par l'endpoint `/metrics` de l'API.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_HELP = {
+    "scraapy_runs_total": ("counter", "Nombre de runs de veille terminés."),
+    "scraapy_node_duration_seconds": ("histogram", "Durée d'exécution des nœuds du graphe."),
+    "scraapy_site_fetch_duration_seconds": ("histogram", "Latence de téléchargement des pages d'accueil."),
+    "scraapy_site_fetch_bytes_total": ("counter", "Octets téléchargés sur les pages d'accueil."),
+    "scraapy_article_stage_duration_seconds": ("histogram", "Latence par article et par étape (download, extract, llm)."),
+    "scraapy_articles_total": ("counter", "Articles traités, par issue."),
+    "scraapy_llm_tokens_total": ("counter", "Tokens consommés par les appels au LLM."),
+    "scraapy_llm_calls_total": ("counter", "Requêtes envoyées au LLM."),
+    "scraapy_content_tokens_total": ("counter", "Tokens des articles avant et après condensation pour le prompt."),
+    "scraapy_llm_retries_total": ("counter", "Reprises d'appels au LLM."),
+    "scraapy_cache_lookups_total": ("counter", "Consultations du cache d'analyses, par résultat."),
+    "scraapy_http_responses_total": ("counter", "Réponses HTTP des téléchargements d'articles, par statut."),
+    "scraapy_near_duplicates_total": ("counter", "Articles regroupés avec un quasi-doublon au lieu d'être analysés."),
+    "scraapy_off_topic_total": ("counter", "Articles écartés par le pré-classement avant l'analyse LLM."),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(q * len(ordered)) - 1)
+    return ordered[index]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = defaultdict(dict)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            self._counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            # [compteurs par bucket..., somme, nombre]
+            state = self._histograms[name].setdefault(_labels(labels), [0.0] * (len(_DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(_DURATION_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(set(self._counters) | set(self._histograms)):
+                kind, help_text = _HELP.get(name, ("untyped", ""))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._counters.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                for labels, state in sorted(self._histograms.get(name, {}).items()):
+                    for i, bound in enumerate(_DURATION_BUCKETS):
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {state[i]:g}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {state[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {state[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {state[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RunMetrics:
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self._registry = registry
+        self._started = time.perf_counter()
+        self.node_durations: Dict[str, List[float]] = defaultdict(list)
+        self.sites: List[Dict] = []
+        self.article_stages: Dict[str, List[float]] = defaultdict(list)
+        self.article_outcomes: Dict[str, int] = defaultdict(int)
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.content_tokens = {"articles": 0, "original": 0, "sent": 0}
+        self.llm_calls = 0
+        self.retries = 0
+        self.cache_lookups: Dict[str, int] = defaultdict(int)
+        self.http_statuses: Dict[str, int] = defaultdict(int)
+        self.near_duplicates = 0
+        self.off_topic = 0
+        self.llm_scheduler: Dict = {}
+
+    @contextmanager
+    def time_node(self, node: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.node_durations[node].append(elapsed)
+            self._registry.observe("scraapy_node_duration_seconds", elapsed, node=node)
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.article_stages[stage].append(elapsed)
+            self._registry.observe("scraapy_article_stage_duration_seconds", elapsed, stage=stage)
+
+    def record_site(self, site: str, host: str, latency: float, size: int, status: str) -> None:
+        self.sites.append({"site": site, "latency_s": round(latency, 3), "bytes": size, "status": status})
+        self._registry.observe("scraapy_site_fetch_duration_seconds", latency, host=host)
+        self._registry.inc("scraapy_site_fetch_bytes_total", size, host=host)
+
+    def record_llm_call(self, usage: Optional[Dict], kind: str = "single") -> None:
+        self.llm_calls += 1
+        self._registry.inc("scraapy_llm_calls_total", kind=kind)
+        if usage:
+            prompt, completion = usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+            self._registry.inc("scraapy_llm_tokens_total", prompt, kind="prompt")
+            self._registry.inc("scraapy_llm_tokens_total", completion, kind="completion")
+
+    def record_content_tokens(self, original: int, sent: int) -> None:
+        self.content_tokens["articles"] += 1
+        self.content_tokens["original"] += original
+        self.content_tokens["sent"] += sent
+        self._registry.inc("scraapy_content_tokens_total", original, kind="original")
+        self._registry.inc("scraapy_content_tokens_total", sent, kind="sent")
+
+    def record_retry(self, reason: str) -> None:
+        self.retries += 1
+        self._registry.inc("scraapy_llm_retries_total", reason=reason)
+
+    def record_cache(self, result: str) -> None:
+        self.cache_lookups[result] += 1
+        self._registry.inc("scraapy_cache_lookups_total", result=result)
+
+    def record_http(self, status: int) -> None:
+        self.http_statuses[str(status)] += 1
+        self._registry.inc("scraapy_http_responses_total", status=str(status))
+
+    def record_duplicates(self, count: int) -> None:
+        self.near_duplicates += count
+        self._registry.inc("scraapy_near_duplicates_total", count)
+
+    def record_off_topic(self, count: int) -> None:
+        self.off_topic += count
+        self._registry.inc("scraapy_off_topic_total", count)
+
+    def record_article(self, error: Optional[str]) -> None:
+        outcome = "ok" if not error else "error"
+        self.article_outcomes[outcome] += 1
+        self._registry.inc("scraapy_articles_total", outcome=outcome)
+
+    def summary(self) -> Dict:
+        wall_time = time.perf_counter() - self._started
+        self._registry.inc("scraapy_runs_total")
+        return {
+            "wall_time_s": round(wall_time, 3),
+            "nodes": {node: {"count": len(values), "total_s": round(sum(values), 3), "max_s": round(max(values), 3)}
+                      for node, values in self.node_durations.items()},
+            "sites": self.sites,
+            "article_stages": {stage: {"count": len(values), "total_s": round(sum(values), 3),
+                                       "p50_s": round(percentile(values, 0.5), 3), "p95_s": round(percentile(values, 0.95), 3)}
+                               for stage, values in self.article_stages.items()},
+            "articles": dict(self.article_outcomes),
+            "llm_calls": self.llm_calls,
+            "tokens": dict(self.tokens),
+            "content_tokens": dict(self.content_tokens),
+            "retries": self.retries,
+            "cache": dict(self.cache_lookups),
+            "http_statuses": dict(self.http_statuses),
+            "near_duplicates": self.near_duplicates,
+            "off_topic": self.off_topic,
+            "llm_scheduler": self.llm_scheduler,
+        }
@@ -0,0 +1,110 @@
+# relevance.py
+"""
+Pré-classement local des articles par rapport à la requête, avant l'analyse LLM.
+
+Score BM25 calculé en mémoire sur le titre (compté deux fois) et le texte extrait. Chaque
+document est résumé dès son extraction (longueur et fréquences des termes de la requête),
+ce qui permet de libérer son texte avant que le classement ne soit calculé.
+Les mots sont normalisés (minuscules, sans accents) puis tronqués à leurs premières
+lettres, ce qui rapproche les variantes d'un même mot ("technologie", "technology") ;
+un terme de la requête couvre aussi les mots plus longs qui commencent par lui ("tech").
+
+Par défaut rien n'est écarté : les scores départagent, dans le classement, les articles de même
+score LLM. Une requête de veille générique ("Tendances en technologie actuellement" se réduit au
+seul terme "techno") ne partage souvent aucun mot avec des articles pourtant dans le sujet (une
+levée de fonds M-Pesa, un nouveau modèle d'OpenAI). Le filtre n'agit que si une limite est fixée (TOP_K ou MIN_SCORE), et
+un seuil de score ne descend jamais sous une part minimale des articles (MIN_KEEP_SHARE).
+Sans limite, les articles partent à l'analyse sans attendre le classement.
+"""
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+RELEVANCE_FILTER_ENABLED = os.getenv("SCRAAPY_RELEVANCE_FILTER", "true").lower() == "true"
+# 0 : pas de limite sur le nombre d'articles envoyés au LLM
+RELEVANCE_TOP_K = int(os.getenv("SCRAAPY_RELEVANCE_TOP_K", "0"))
+# 0 : pas de seuil ; sans seuil ni TOP_K, tous les articles sont analysés
+RELEVANCE_MIN_SCORE = float(os.getenv("SCRAAPY_RELEVANCE_MIN_SCORE", "0"))
+# Part des articles toujours gardée (les mieux classés) quand le seuil en écarterait davantage
+RELEVANCE_MIN_KEEP_SHARE = float(os.getenv("SCRAAPY_RELEVANCE_MIN_KEEP_SHARE", "0.5"))
+# Une limite oblige à classer tous les articles avant d'en envoyer un seul au LLM
+RELEVANCE_LIMITED = RELEVANCE_FILTER_ENABLED and (RELEVANCE_TOP_K > 0 or RELEVANCE_MIN_SCORE > 0)
+
+_STEM_LENGTH = 6
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_WORD = re.compile(r"[a-z0-9]{2,}")
+# Mots vides, y compris les formules courantes des requêtes de veille qui ne désignent aucun sujet
+_STOPWORDS = set("""
+le la les un une des du de d l et ou en au aux dans sur pour par avec sans sous ce cet cette ces son sa ses leur leurs
+qui que quoi dont est sont etre a ont plus moins tres tout tous toute toutes comme mais ne pas
+the a an and or of to in on for with by from at as is are was were be been this that these those its it their about
+veille actualite actualites principales principaux tendance tendances actuellement monde nouvelles news latest
+""".split())
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return [word[:_STEM_LENGTH] for word in _WORD.findall(_normalize(text)) if word not in _STOPWORDS]
+
+
+def query_terms(query: str) -> Set[str]:
+    return set(tokenize(query))
+
+
+def document_stats(terms: Set[str], document: str) -> Tuple[int, Dict[str, int]]:
+    """Longueur du document et fréquence des mots qui commencent par un terme de la requête."""
+    words = tokenize(document)
+    return len(words), dict(Counter(word for word in words if any(word.startswith(term) for term in terms)))
+
+
+def bm25_from_stats(stats: List[Tuple[int, Dict[str, int]]]) -> np.ndarray:
+    """Score BM25 de chaque document résumé par document_stats ; 0 si aucun terme de la requête n'y apparaît."""
+    scores = np.zeros(len(stats))
+    if not stats:
+        return scores
+    counts = [count for _, count in stats]
+    lengths = np.array([length for length, _ in stats], dtype=float)
+    average_length = lengths.mean() or 1.0
+    norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * lengths / average_length)
+    for term in set().union(*counts):
+        tf = np.array([count.get(term, 0) for count in counts], dtype=float)
+        df = np.count_nonzero(tf)
+        idf = np.log(1 + (len(stats) - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def bm25_scores(query: str, documents: List[str]) -> np.ndarray:
+    """Score BM25 de chaque document ; 0 si aucun terme de la requête n'y apparaît."""
+    terms = query_terms(query)
+    if not terms:
+        return np.zeros(len(documents))
+    return bm25_from_stats([document_stats(terms, document) for document in documents])
+
+
+def select_relevant(scores: np.ndarray, top_k: int = RELEVANCE_TOP_K, min_score: float = RELEVANCE_MIN_SCORE,
+                    min_keep_share: float = RELEVANCE_MIN_KEEP_SHARE) -> List[int]:
+    """Indices des documents à garder d'après leurs scores, du plus pertinent au moins pertinent."""
+    ranked = [int(index) for index in np.argsort(-scores, kind="stable")]
+    if not scores.any():
+        # Aucun document ne contient les termes de la requête (requête générique ou dans une autre langue) : on garde tout
+        return ranked
+    kept = ranked
+    if min_score > 0:
+        kept = [index for index in ranked if scores[index] > min_score]
+        floor = min(len(ranked), math.ceil(min_keep_share * len(ranked)))
+        if len(kept) < floor:
+            kept = ranked[:floor]
+    # TOP_K est un budget explicite : il s'applique après la part minimale
+    return kept[:top_k] if top_k > 0 else kept
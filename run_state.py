@@ -0,0 +1,107 @@
+# run_state.py
+"""
+État persistant des runs incrémentaux (SQLite).
+
+On y conserve, pour chaque requête, les URLs d'articles déjà traitées (par source) ainsi
+que le dernier classement produit et la signature MinHash de ses articles, afin qu'un nouveau
+run de la même requête ne traite que les articles apparus depuis, rattache à un article déjà
+classé ceux qui racontent la même histoire, et fusionne le reste dans son classement existant.
+Deux requêtes différentes ont des états indépendants : un article vu pour l'une reste nouveau
+pour l'autre.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Mapping, Set
+
+from cache import normalize_url
+
+RUN_STATE_PATH = os.getenv("SCRAAPY_RUN_STATE_PATH", "scraapy_run_state.sqlite3")
+RUN_STATE_RETENTION_SECONDS = float(os.getenv("SCRAAPY_RUN_STATE_RETENTION_DAYS", "7")) * 86400
+
+
+def _query_key(query: str) -> str:
+    return query.strip().lower()
+
+
+class RunStateStore:
+    def __init__(self, path: str = RUN_STATE_PATH, retention_seconds: float = RUN_STATE_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_articles (
+                query TEXT NOT NULL,
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (query, source, url)
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                query TEXT NOT NULL,
+                url TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (query, url)
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ranked_sets (
+                query TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                articles TEXT NOT NULL
+            )""")
+        self._conn.commit()
+
+    def seen_urls(self, query: str, sources: Iterable[str]) -> Set[str]:
+        sources = list(sources)
+        if not sources:
+            return set()
+        placeholders = ",".join("?" * len(sources))
+        rows = self._conn.execute(f"SELECT url FROM seen_articles WHERE query = ? AND source IN ({placeholders})",
+                                  [_query_key(query), *sources])
+        return {url for (url,) in rows}
+
+    def mark_seen(self, query: str, articles: Iterable[Dict]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO seen_articles (query, source, url, first_seen) VALUES (?, ?, ?, ?)",
+            [(_query_key(query), article["source"], normalize_url(article["url"]), now) for article in articles])
+        self._conn.commit()
+
+    def load_ranked(self, query: str) -> List[Dict]:
+        row = self._conn.execute("SELECT articles FROM ranked_sets WHERE query = ?", (_query_key(query),)).fetchone()
+        if row is None:
+            return []
+        horizon = time.time() - self.retention_seconds
+        return [article for article in json.loads(row[0]) if article.get("first_seen", 0) > horizon]
+
+    def save_ranked(self, query: str, articles: List[Dict]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO ranked_sets (query, updated_at, articles) VALUES (?, ?, ?)",
+            (_query_key(query), time.time(), json.dumps(articles, ensure_ascii=False)))
+        self._conn.commit()
+
+    def load_signatures(self, query: str, urls: Iterable[str]) -> Dict[str, bytes]:
+        """Signatures des articles classés (URL normalisée -> signature), pour le regroupement des quasi-doublons."""
+        wanted = {normalize_url(url) for url in urls}
+        rows = self._conn.execute("SELECT url, signature FROM signatures WHERE query = ?", (_query_key(query),))
+        return {url: signature for url, signature in rows if url in wanted}
+
+    def save_signatures(self, query: str, signatures: Mapping[str, bytes]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO signatures (query, url, signature, first_seen) VALUES (?, ?, ?, ?)",
+            [(_query_key(query), normalize_url(url), signature, now) for url, signature in signatures.items()])
+        self._conn.commit()
+
+    def prune(self) -> None:
+        horizon = time.time() - self.retention_seconds
+        self._conn.execute("DELETE FROM seen_articles WHERE first_seen <= ?", (horizon,))
+        self._conn.execute("DELETE FROM signatures WHERE first_seen <= ?", (horizon,))
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
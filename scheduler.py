@@ -1,28 +1,292 @@
-# scheduler_streamlit.py
+# scheduler.py
+"""
+Exécution planifiée de la veille, sur asyncio.
 
-import time
-import threading
+Chaque requête planifiée a son expression cron (5 champs : minute heure jour mois
+jour-de-semaine, ou @hourly / @daily / @weekly), son délai maximum et sa politique de
+chevauchement : si le run précédent n'est pas terminé, le nouveau est ignoré ("skip")
+ou mis en attente ("queue", un seul run en attente au plus). Les runs sont incrémentaux.
+
+Chaque run est ajouté à un historique SQLite (résultat, durée, statut), purgé au-delà de
+la durée de rétention. Le dernier rapport est aussi écrit de façon atomique dans
+`last_auto_report.json` : un lecteur ne voit jamais de fichier à moitié écrit.
+
+Les planifications se configurent dans un fichier JSON (SCRAAPY_SCHEDULES_PATH) :
+    [{"name": "tech", "query": "...", "cron": "0 8 * * *", "timeout": 1800, "overlap": "skip"}]
+"""
+
+import argparse
+import asyncio
 import json
-from datetime import datetime
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
 from scraap import run_veile_workflow
 
 DEFAULT_QUERY = "Principales actualités dans le monde de la tech"
-DEFAULT_TIME_FILTER = "Aujourd'hui"
-SAVE_PATH = "last_auto_report.json"
+DEFAULT_CRON = os.getenv("SCRAAPY_SCHEDULE_CRON", "0 * * * *")
+SAVE_PATH = os.getenv("SCRAAPY_LAST_REPORT_PATH", "last_auto_report.json")
+SCHEDULES_PATH = os.getenv("SCRAAPY_SCHEDULES_PATH", "")
+SCHEDULE_TIMEOUT = float(os.getenv("SCRAAPY_SCHEDULE_TIMEOUT", "1800"))
+HISTORY_PATH = os.getenv("SCRAAPY_SCHEDULER_HISTORY_PATH", "scraapy_scheduler.sqlite3")
+HISTORY_RETENTION_SECONDS = float(os.getenv("SCRAAPY_SCHEDULER_HISTORY_DAYS", "30")) * 86400
+
+OVERLAP_SKIP = "skip"
+OVERLAP_QUEUE = "queue"
+
+_CRON_ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@weekly": "0 0 * * 0", "@monthly": "0 0 1 * *"}
+# (minimum, maximum) de chaque champ ; le jour de semaine 7 est aussi dimanche
+_CRON_BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(text: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(bound) for bound in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f"Champ cron invalide : '{text}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = _CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expression cron invalide (5 champs attendus) : '{expression}'")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(text, low, high) for text, (low, high) in zip(fields, _CRON_BOUNDS))
+        self.weekdays = {day % 7 for day in weekdays}
+        # Comme cron : si jour du mois et jour de semaine sont tous deux restreints, l'un ou l'autre suffit
+        self._days_restricted, self._weekdays_restricted = fields[2] != "*", fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"L'expression cron '{self.expression}' ne se déclenche jamais")
+
+
+@dataclass
+class ScheduledQuery:
+    name: str
+    query: str
+    cron: str = DEFAULT_CRON
+    timeout: float = SCHEDULE_TIMEOUT
+    overlap: str = OVERLAP_SKIP
+    incremental: bool = True
+    report_path: Optional[str] = None
+    schedule: CronSchedule = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.overlap not in (OVERLAP_SKIP, OVERLAP_QUEUE):
+            raise ValueError(f"Politique de chevauchement inconnue : '{self.overlap}'")
+        self.schedule = CronSchedule(self.cron)
+
+
+def load_schedules(path: str = SCHEDULES_PATH) -> List[ScheduledQuery]:
+    if not path:
+        return [ScheduledQuery(name="default", query=DEFAULT_QUERY, report_path=SAVE_PATH)]
+    with open(path, encoding="utf-8") as f:
+        return [ScheduledQuery(**entry) for entry in json.load(f)]
+
+
+def write_json_atomic(path: str, data: Dict) -> None:
+    # Fichier temporaire dans le même dossier, puis renommage : le remplacement est atomique
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RunHistory:
+    """Historique des runs planifiés : une ligne ajoutée par run, jamais modifiée."""
 
-def job_scheduler():
-    while True:
-        print("⏰ [SCHEDULER] Lancement du workflow automatique...")
+    def __init__(self, path: str = HISTORY_PATH, retention_seconds: float = HISTORY_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                query TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                duration_s REAL NOT NULL,
+                error TEXT,
+                result BLOB
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_by_name ON runs (name, started_at)")
+        self._conn.commit()
+
+    def append(self, name: str, query: str, status: str, started_at: float, duration_s: float,
+               error: Optional[str] = None, result: Optional[Dict] = None) -> None:
+        body = zlib.compress(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8")) if result else None
+        self._conn.execute(
+            "INSERT INTO runs (name, query, status, started_at, duration_s, error, result) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, query, status, started_at, round(duration_s, 3), error, body))
+        self._conn.commit()
+
+    def _row(self, row) -> Dict:
+        run_id, name, query, status, started_at, duration_s, error, body = row
+        return {"id": run_id, "name": name, "query": query, "status": status, "started_at": started_at,
+                "duration_s": duration_s, "error": error,
+                "result": json.loads(zlib.decompress(body).decode("utf-8")) if body else None}
+
+    def latest(self, name: Optional[str] = None, status: str = "done") -> Optional[Dict]:
+        sql = "SELECT * FROM runs WHERE status = ?" + (" AND name = ?" if name else "") + " ORDER BY started_at DESC LIMIT 1"
+        row = self._conn.execute(sql, (status, name) if name else (status,)).fetchone()
+        return self._row(row) if row else None
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        # Sans les résultats : vue légère pour lister les runs
+        rows = self._conn.execute(
+            "SELECT id, name, query, status, started_at, duration_s, error, NULL FROM runs ORDER BY started_at DESC LIMIT ?",
+            (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def prune(self) -> None:
+        self._conn.execute("DELETE FROM runs WHERE started_at <= ?", (time.time() - self.retention_seconds,))
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class Scheduler:
+    def __init__(self, jobs: List[ScheduledQuery], history: Optional[RunHistory] = None):
+        self.jobs = jobs
+        self.history = history or RunHistory()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queued: Set[str] = set()
+
+    async def run_forever(self) -> None:
+        print(f"⏰ [SCHEDULER] {len(self.jobs)} planification(s) : " +
+              ", ".join(f"{job.name} ({job.cron})" for job in self.jobs))
+        try:
+            await asyncio.gather(*(self._job_loop(job) for job in self.jobs))
+        finally:
+            for task in self._running.values():
+                task.cancel()
+            self.history.close()
+
+    async def run_once(self) -> None:
+        """Lance immédiatement chaque planification une fois et attend la fin des runs."""
         try:
-            result = run_veile_workflow(DEFAULT_QUERY, DEFAULT_TIME_FILTER)
-            result["executed_at"] = datetime.utcnow().isoformat()
+            await asyncio.gather(*(self._execute(job) for job in self.jobs))
+        finally:
+            self.history.close()
 
-            # Sauvegarde dans un fichier JSON local
-            with open(SAVE_PATH, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=4)
+    async def _job_loop(self, job: ScheduledQuery) -> None:
+        while True:
+            next_run = job.schedule.next_after(datetime.now())
+            await asyncio.sleep(max(0.0, (next_run - datetime.now()).total_seconds()))
+            self._trigger(job)
 
-            print("✅ [SCHEDULER] Rapport automatique sauvegardé avec succès.")
+    def _trigger(self, job: ScheduledQuery) -> None:
+        if job.name in self._running:
+            if job.overlap == OVERLAP_QUEUE:
+                self._queued.add(job.name)
+                print(f"⏳ [SCHEDULER] '{job.name}' encore en cours : run mis en attente.")
+            else:
+                print(f"⏭️ [SCHEDULER] '{job.name}' encore en cours : run ignoré.")
+            return
+        task = asyncio.get_running_loop().create_task(self._execute(job))
+        self._running[job.name] = task
+        task.add_done_callback(lambda _: self._running.pop(job.name, None))
+
+    async def _execute(self, job: ScheduledQuery) -> None:
+        while True:
+            await self._run(job)
+            if job.name not in self._queued:
+                return
+            self._queued.discard(job.name)
+
+    async def _run(self, job: ScheduledQuery) -> None:
+        print(f"⏰ [SCHEDULER] Lancement de '{job.name}' : {job.query}")
+        started_at, started = time.time(), time.perf_counter()
+        result, error = None, None
+        try:
+            result = await asyncio.wait_for(run_veile_workflow(job.query, incremental=job.incremental), timeout=job.timeout)
+            error = result.get("error_message")
+            status = "failed" if error else "done"
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"Délai dépassé ({job.timeout:.0f}s)"
+        except Exception as e:
+            status, error = "failed", str(e)
+        duration = time.perf_counter() - started
+
+        try:
+            self.history.append(job.name, job.query, status, started_at, duration, error, result)
+            self.history.prune()
+            if status == "done" and job.report_path:
+                result["executed_at"] = datetime.now(timezone.utc).isoformat()
+                write_json_atomic(job.report_path, result)
         except Exception as e:
-            print(f"❌ [SCHEDULER] Erreur : {e}")
+            print(f"❌ [SCHEDULER] Sauvegarde impossible pour '{job.name}' : {e}")
+            return
+        if status == "done":
+            print(f"✅ [SCHEDULER] '{job.name}' terminé en {duration:.1f}s, rapport sauvegardé.")
+        else:
+            print(f"❌ [SCHEDULER] '{job.name}' : {status} ({error})")
+
+
+def job_scheduler() -> None:
+    # Point d'entrée bloquant, par exemple dans un thread dédié
+    asyncio.run(Scheduler(load_schedules()).run_forever())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exécution planifiée de la veille.")
+    parser.add_argument("--once", action="store_true", help="Lance chaque planification immédiatement, une seule fois.")
+    args = parser.parse_args(argv)
+    scheduler = Scheduler(load_schedules())
+    asyncio.run(scheduler.run_once() if args.once else scheduler.run_forever())
+    return 0
+
 
-        time.sleep(60 * 60)  # Toutes les heures
+if __name__ == "__main__":
+    raise SystemExit(main())
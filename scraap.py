@@ -1,26 +1,82 @@
 import os
-from typing import List, Dict, TypedDict, Optional
+import asyncio
+import hashlib
+import json
+import operator
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Any, AsyncIterator, Callable, List, Dict, Mapping, TypedDict, Optional, Tuple
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import trafilatura
+import httpx
+from urllib.parse import urlparse
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_deepseek import ChatDeepSeek
-from langgraph.graph import StateGraph, END
-from pydantic import BaseModel,Field
+from pydantic import BaseModel,Field,ValidationError
+
+from cache import AnalysisCache, content_fingerprint, normalize_url
+from run_state import RunStateStore
+from blob_store import BlobStore
+from metrics import RunMetrics
+from llm_scheduler import LLMScheduler, RunDeadlineExceeded
+from http_client import FetchResult, SharedHttpClient, ValidatorStore
+from dedup import NearDuplicateIndex, decode_signature, document_signature, encode_signature
+from extraction import MIN_CONTENT_CHARS, extract_document, get_extract_pool, reset_extract_pool
+from condense import condense, count_tokens
+from relevance import RELEVANCE_FILTER_ENABLED, RELEVANCE_LIMITED, bm25_from_stats, document_stats, query_terms, select_relevant
+from sources import Source, load_sources
+
+# LangChain, LangGraph et le client DeepSeek pèsent plus d'une seconde à l'import : ils ne sont
+# chargés qu'au premier run (get_llm, get_langgraph_app), d'où les annotations en chaîne des nœuds.
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.types import Send, StreamWriter
 
 # --- Configuration ---
 load_dotenv()
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY n'est pas configurée.")
-llm = ChatDeepSeek(model="deepseek-chat", temperature=0, max_retries=2)
-os.environ["LANGCHAIN_TRACING_V2"] = os.getenv("LANGSMITH_TRACING", "true")
+LLM_MODEL = "deepseek-chat"
+# Traçage LangSmith : actif par défaut seulement si une clé est fournie ; les variables absentes ne sont pas posées
+os.environ["LANGCHAIN_TRACING_V2"] = os.getenv("LANGSMITH_TRACING", "true" if os.getenv("LANGSMITH_API_KEY") else "false")
 os.environ["LANGCHAIN_ENDPOINT"] = os.getenv("LANGSMITH_ENDPOINT", "https://api.smith.langchain.com")
-os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGSMITH_PROJECT")
+for _variable, _langsmith_variable in (("LANGCHAIN_API_KEY", "LANGSMITH_API_KEY"), ("LANGCHAIN_PROJECT", "LANGSMITH_PROJECT")):
+    if os.getenv(_langsmith_variable):
+        os.environ[_variable] = os.environ[_langsmith_variable]
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Client DeepSeek du processus, construit au premier appel ; sans clé API, seul le run échoue."""
+    if not DEEPSEEK_API_KEY:
+        raise ValueError("DEEPSEEK_API_KEY n'est pas configurée.")
+    from langchain_deepseek import ChatDeepSeek
+    # Les reprises sont gérées par l'ordonnanceur (llm_scheduler.py), qui doit voir chaque 429
+    return ChatDeepSeek(model=LLM_MODEL, temperature=0, max_retries=0, max_tokens=8192)
+
+# Concurrence du pipeline d'analyse (voir extract_analyze_and_report)
+DOWNLOAD_CONCURRENCY = int(os.getenv("SCRAAPY_DOWNLOAD_CONCURRENCY", "16"))
+# Concurrence initiale des appels LLM, ajustée ensuite par l'ordonnanceur
+LLM_CONCURRENCY = int(os.getenv("SCRAAPY_LLM_CONCURRENCY", "8"))
+ARTICLE_TIMEOUT = float(os.getenv("SCRAAPY_ARTICLE_TIMEOUT", "180"))
+# Échéance globale d'un run (0 : aucune) ; au-delà, les articles pas encore analysés sont ignorés
+RUN_DEADLINE = float(os.getenv("SCRAAPY_RUN_DEADLINE", "900"))
+
+# Scraping des pages d'accueil : toutes les sources en parallèle (limites de connexions dans http_client.py)
+SITE_TIMEOUT = float(os.getenv("SCRAAPY_SITE_TIMEOUT", "20"))
+
+# Cache persistant des analyses (voir cache.py)
+CACHE_ENABLED = os.getenv("SCRAAPY_CACHE_ENABLED", "true").lower() == "true"
+# Requêtes conditionnelles (ETag / Last-Modified) sur les pages déjà téléchargées
+CONDITIONAL_REQUESTS = os.getenv("SCRAAPY_CONDITIONAL_REQUESTS", "true").lower() == "true"
+# Regroupement des quasi-doublons (même histoire sur plusieurs sites) avant l'analyse LLM
+DEDUP_ENABLED = os.getenv("SCRAAPY_DEDUP_ENABLED", "true").lower() == "true"
+
+# Mode d'analyse par lots : plusieurs articles par requête LLM
+LLM_BATCH_MODE = os.getenv("SCRAAPY_LLM_BATCH_MODE", "false").lower() == "true"
+LLM_BATCH_MAX_ARTICLES = int(os.getenv("SCRAAPY_LLM_BATCH_MAX_ARTICLES", "6"))
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("SCRAAPY_LLM_BATCH_TOKEN_BUDGET", "24000"))
+LLM_BATCH_OUTPUT_BUDGET = int(os.getenv("SCRAAPY_LLM_BATCH_OUTPUT_BUDGET", "7500"))
+LLM_BATCH_LINGER = float(os.getenv("SCRAAPY_LLM_BATCH_LINGER", "0.5"))
 
 
 class ArticleAnalysis(BaseModel):
@@ -36,6 +92,40 @@ class ArticleAnalysis(BaseModel):
         resume_neutre: str = Field(description="Un résumé factuel et dense de l'article, de style journalistique (type agence de presse), ""strictement compris entre 700 et 800 caractères.")
         problematique_generale: str = Field(description="La problématique principale ou universelle soulevée par l'article.")
 
+ANALYSIS_PROMPT_TEMPLATE = """Vous êtes un analyste technologique mondial doublé d'un stratège pour l'Afrique. Pour l'article fourni, effectuez une analyse en deux temps :
+    
+    **Partie 1 : Analyse Globale (Neutre)**
+    1.  **Résumé Neutre :** Fournissez un résumé factuel et dense de l'article, de style journalistique (type agence de presse), strictement compris entre 700 et 800 caractères.
+    2.  **Problématique Générale :** Identifiez la problématique principale ou universelle soulevée.
+    
+    **Partie 2 : Analyse Stratégique pour l'Afrique**
+    3.  **Impact sur l'Afrique :** Quel est l'impact direct ou indirect pour le continent ?
+    4.  **Problématique Spécifique à l'Afrique :** Quelle dépendance ou faiblesse cela révèle-t-il pour l'Afrique ?
+    5.  **Éveil de Conscience :** Quelle est la leçon critique pour les acteurs de la tech africaine ?
+    6.  **Piste d'Opportunité :** Quelle opportunité concrète cela crée-t-il ?
+    7.  **Score de Pertinence :** Attribuez un score de 1 à 10 sur l'importance de cette nouvelle pour l'Afrique.
+
+    Article à analyser : <article_text>{content}</article_text>"""
+
+# Toute modification du prompt, du modèle ou du schéma invalide les analyses en cache
+ANALYSIS_VERSION = hashlib.sha256(
+    (ANALYSIS_PROMPT_TEMPLATE + LLM_MODEL + json.dumps(ArticleAnalysis.model_json_schema(), sort_keys=True)).encode("utf-8")
+).hexdigest()[:16]
+
+class BatchedArticleAnalysis(ArticleAnalysis):
+    article_id: str = Field(description="L'identifiant de l'article, recopié depuis la balise <article id=...>.")
+
+class ArticleAnalysisBatch(BaseModel):
+    analyses: List[BatchedArticleAnalysis] = Field(description="Une analyse par article fourni.")
+
+ANALYSIS_BATCH_PROMPT_TEMPLATE = (
+    ANALYSIS_PROMPT_TEMPLATE.split("Article à analyser :")[0].replace("Pour l'article fourni", "Pour chacun des articles fournis, indépendamment des autres")
+    + """Chaque article est balisé par <article id="...">. Renvoyez exactement une analyse par article, en recopiant son identifiant dans le champ article_id.
+
+    Articles à analyser :
+{articles}"""
+)
+
 # --- SECTION TYPES (Cohérente et Finale) ---
 class FoundArticle(TypedDict):
     title: str
@@ -43,7 +133,8 @@ class FoundArticle(TypedDict):
     source: str
 
 class AnalyzedArticle(FoundArticle):
-    content: Optional[str]
+    # Le texte extrait n'est pas transporté dans l'état : il est dans le BlobStore, sous cet identifiant
+    content_id: Optional[str]
     date: Optional[str]
     type_evenement: Optional[str]
     resume_strategique: Optional[str]
@@ -53,215 +144,739 @@ class AnalyzedArticle(FoundArticle):
     score_pertinence: Optional[int]
     resume_neutre: Optional[str] 
     problematique_generale: Optional[str]
+    is_new: Optional[bool]
+    first_seen: Optional[float]
+    corroborating_sources: Optional[List[FoundArticle]]
+    relevance_score: Optional[float]
+    content_tokens: Optional[int]
 
 class AgentState(TypedDict):
     query: str
     sites_to_process: List[str]
-    current_site: str
-    found_articles: List[FoundArticle]
+    found_articles: Annotated[List[FoundArticle], operator.add]
     analyzed_articles: List[AnalyzedArticle]
     final_report: Optional[str]
     error_message: Optional[str]
 
+class SiteTask(TypedDict):
+    site_url: str
 
-# --- Fonctions de Scraping ---
-DOMAINES_A_IGNORER = ['bloomberg.com', 'wsj.com', 'nytimes.com', 'reuters.com', 'ft.com', 'theinformation.com', 'axios.com', 't.co', 'ad.doubleclick.net']
-def scrape_techmeme(soup: BeautifulSoup, base_url: str) -> List[FoundArticle]:
-    articles = []
-    for link in soup.select('strong > a'):
-        href, title = link.get('href'), link.get_text(strip=True)
-        if href and title and not any(domaine in href for domaine in DOMAINES_A_IGNORER):
-            articles.append({"title": title, "url": urljoin(base_url, href), "source": "Techmeme"})
-    return articles
-def scrape_techcabal(soup: BeautifulSoup, base_url: str) -> List[FoundArticle]:
-    articles = []
-    for link in soup.select("article.article-list-item a.article-list-title"):
-        title, href = link.get_text(strip=True), link.get('href')
-        if title and href: articles.append({"title": title, "url": urljoin(base_url, href), "source": "TechCabal"})
-    return articles
-def scrape_techpoint_africa(soup: BeautifulSoup, base_url: str) -> List[FoundArticle]:
-    articles = []
-    for link in soup.select("div.gb-query-loop-item .value a"):
-        href, title = link.get_text(strip=True), link.get('href')
-        if href and title: articles.append({"title": title, "url": urljoin(base_url, href), "source": "TechPoint Africa"})
-    return articles
-def scrape_disruptafrica(soup: BeautifulSoup, base_url: str) -> List[FoundArticle]:
-    articles = []
-    for link in soup.select(".post-title a"):
-        href, title = link.get_text(strip=True), link.get('href')
-        if href and title: articles.append({"title": title, "url": urljoin(base_url, href), "source": "Disrupt Africa"})
-    return articles
-def scrape_weetracker(soup: BeautifulSoup, base_url: str) -> List[FoundArticle]:
-    articles = []
-    for link in soup.select("h5.f-title a"):
-        href, title = link.get_text(strip=True), link.get('href')
-        if href and title: articles.append({"title": title, "url": urljoin(base_url, href), "source": "WeeTracker"})
-    return articles
-SCRAPER_REGISTRY = {
-    "https://www.techmeme.com/": scrape_techmeme, "https://techcabal.com/": scrape_techcabal,
-    "https://techpoint.africa/": scrape_techpoint_africa, "https://disruptafrica.com/": scrape_disruptafrica, 
-    "https://weetracker.com/": scrape_weetracker,         
-}
+
+# --- Sources à scraper ---
+# Déclarées dans sources.json (sélecteur, règles titre/lien, flux RSS/Atom), compilées une fois
+SCRAPER_REGISTRY: Dict[str, Source] = load_sources()
 
 
 # --- NOEUDS DU GRAPHE ---
-def plan_next_site(state: AgentState) -> dict:
-    print("--- NŒUD : Planification du prochain site ---")
-    sites = state.get("sites_to_process", []).copy()
-    if sites:
-        next_site = sites.pop(0)
-        return {"current_site": next_site, "sites_to_process": sites}
+def _run_metrics(config: "RunnableConfig") -> RunMetrics:
+    return config.get("configurable", {}).get("metrics") or RunMetrics()
+
+def fan_out_sites(state: AgentState) -> List["Send"]:
+    # Map : une branche parallèle par site, le reducer de found_articles fait le reduce
+    sites = state.get("sites_to_process") or list(SCRAPER_REGISTRY.keys())
+    print(f"--- NŒUD : Lancement du scraping en parallèle de {len(sites)} sites ---")
+    return [Send("scrape_site", {"site_url": site_url}) for site_url in sites]
+
+def _site_timeout(site_url: str) -> httpx.Timeout:
+    # Délai propre à la source (champ "timeout" de sources.json), sinon SCRAAPY_SITE_TIMEOUT
+    source = SCRAPER_REGISTRY.get(site_url)
+    timeout = source.timeout if source and source.timeout else SITE_TIMEOUT
+    return httpx.Timeout(timeout, connect=min(timeout, 10.0), pool=None)
+
+def _new_http_client() -> SharedHttpClient:
+    return SharedHttpClient(validators=ValidatorStore() if CONDITIONAL_REQUESTS else None)
+
+@asynccontextmanager
+async def _http_client(config: "RunnableConfig") -> AsyncIterator[SharedHttpClient]:
+    # Client partagé du run, ou client temporaire si le graphe est appelé directement
+    client = config.get("configurable", {}).get("http_client")
+    if client is not None:
+        yield client
     else:
-        return {"current_site": ""}
+        async with _new_http_client() as client:
+            yield client
+
+def _parse_listing(source: Source, html: str, site_url: str) -> List[FoundArticle]:
+    return source.parse(html, site_url)
 
-def scraper_dispatcher(state: AgentState) -> dict:
-    site_url = state["current_site"]
-    print(f"--- NŒUD : Dispatching vers le scraper pour {site_url} ---")
-    scraper_function = SCRAPER_REGISTRY.get(site_url)
-    if not scraper_function: return {}
+async def _scrape_site(client: SharedHttpClient, site_url: str, metrics: RunMetrics) -> List[FoundArticle]:
+    started = time.perf_counter()
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(site_url, headers=headers, timeout=20)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        new_articles = scraper_function(soup, site_url)
+        result = await client.fetch(site_url, timeout=_site_timeout(site_url))
+    except Exception as e:
+        metrics.record_site(site_url, urlparse(site_url).netloc, time.perf_counter() - started, 0, type(e).__name__)
+        raise
+    metrics.record_site(site_url, urlparse(site_url).netloc, time.perf_counter() - started,
+                        result.bytes_received, str(result.status))
+    if not result.ok:
+        raise RuntimeError(f"HTTP {result.status}")
+    source = SCRAPER_REGISTRY[site_url]
+    # Page inchangée (304) : la liste extraite au run précédent est réutilisée si les règles n'ont pas changé,
+    # sinon le corps mémorisé est ré-analysé
+    parsed = result.parsed if result.not_modified else None
+    if isinstance(parsed, dict) and parsed.get("rules") == source.fingerprint:
+        return parsed["articles"]
+    # Le parsing HTML est CPU : on le sort de la boucle d'événements
+    articles = await asyncio.to_thread(_parse_listing, source, result.text, site_url)
+    client.remember_parsed(site_url, {"rules": source.fingerprint, "articles": articles})
+    return articles
+
+async def scrape_site(state: SiteTask, config: "RunnableConfig", writer: "StreamWriter") -> dict:
+    site_url = state["site_url"]
+    print(f"--- NŒUD : Scraping de {site_url} ---")
+    if site_url not in SCRAPER_REGISTRY: return {}
+    metrics = _run_metrics(config)
+    try:
+        with metrics.time_node("scrape_site"):
+            async with _http_client(config) as client:
+                new_articles = await _scrape_site(client, site_url, metrics)
         print(f"Trouvé {len(new_articles)} articles sur {site_url}.")
-        current_articles = state.get("found_articles", [])
-        return {"found_articles": current_articles + new_articles}
+        writer({"type": "site_scraped", "site": site_url, "articles_found": len(new_articles)})
+        return {"found_articles": new_articles}
     except Exception as e:
-        print(f"ERREUR lors du scraping de {site_url}: {e}")
+        print(f"ERREUR lors du scraping de {site_url}: {e!r}")
+        writer({"type": "site_scraped", "site": site_url, "articles_found": 0, "error": repr(e)})
         return {}
 
-# --- Logique de Routage ---
-def should_continue(state: AgentState) -> str:
-    return "continue_scraping" if state.get("current_site") else "end_scraping"
 
+# --- Pipeline concurrent d'extraction et d'analyse ---
+_INSUFFICIENT_CONTENT = "Contenu insuffisant"
+_SKIPPED = "Ignoré : échéance du run atteinte"
+_NOT_HTML = "Contenu non HTML"
+_OFF_TOPIC = "Hors sujet pour la requête"
 
+def _empty_analyzed_article(article: FoundArticle) -> AnalyzedArticle:
+    # Template d'erreur mis à jour avec les nouveaux champs
+    return {**article, "content_id": None, "date": None, "resume_neutre": None, "problematique_generale": None, "impact_afrique": None, "problematique_africaine": None, "eveil_de_conscience": None, "piste_opportunite": None, "score_pertinence": None, "error": None}
 
-# Remplacez votre fonction extract_analyze_and_report par celle-ci
-# --- VERSION FINALE AVEC CLASSEMENT COMPLET ---
-# Remplacez votre fonction extract_analyze_and_report par celle-ci
-# Remplacez votre fonction extract_analyze_and_report par cette version finale et complète
+# --- Analyse LLM : un article par requête ou par lots ---
+# Les articles arrivent déjà condensés dans leur budget de tokens (condense.py) ; taille typique d'une analyse en sortie
+_OUTPUT_TOKENS_PER_ARTICLE = 1200
 
-def extract_analyze_and_report(state: AgentState) -> dict:
-    print("\n--- NŒUD FINAL : Extraction, Analyse et Rapport ---")
-    all_found_articles = state.get("found_articles", [])
-    if not all_found_articles:
-        return {"final_report": "Aucun article trouvé.", "analyzed_articles": []}
+def _usage(response: Dict) -> Optional[Dict]:
+    # Chaînes construites avec include_raw=True : le message brut porte la consommation de tokens
+    return getattr(response.get("raw"), "usage_metadata", None)
 
-    unique_articles_list = list({article['url']: article for article in all_found_articles}.values())
-    print(f"Traitement de {len(unique_articles_list)} articles uniques.")
-    
-    # NOUVEAU PROMPT COMPLET
-    analysis_prompt_template = """Vous êtes un analyste technologique mondial doublé d'un stratège pour l'Afrique. Pour l'article fourni, effectuez une analyse en deux temps :
-    
-    **Partie 1 : Analyse Globale (Neutre)**
-    1.  **Résumé Neutre :** Fournissez un résumé factuel et dense de l'article, de style journalistique (type agence de presse), strictement compris entre 700 et 800 caractères.
-    2.  **Problématique Générale :** Identifiez la problématique principale ou universelle soulevée.
-    
-    **Partie 2 : Analyse Stratégique pour l'Afrique**
-    3.  **Impact sur l'Afrique :** Quel est l'impact direct ou indirect pour le continent ?
-    4.  **Problématique Spécifique à l'Afrique :** Quelle dépendance ou faiblesse cela révèle-t-il pour l'Afrique ?
-    5.  **Éveil de Conscience :** Quelle est la leçon critique pour les acteurs de la tech africaine ?
-    6.  **Piste d'Opportunité :** Quelle opportunité concrète cela crée-t-il ?
-    7.  **Score de Pertinence :** Attribuez un score de 1 à 10 sur l'importance de cette nouvelle pour l'Afrique.
+def _total_tokens(response: Dict) -> Optional[int]:
+    usage = _usage(response)
+    return (usage.get("input_tokens", 0) or 0) + (usage.get("output_tokens", 0) or 0) if usage else None
 
-    Article à analyser : <article_text>{content}</article_text>"""
-    
-    analysis_prompt = ChatPromptTemplate.from_template(analysis_prompt_template)
-    analysis_chain = analysis_prompt | llm.with_structured_output(ArticleAnalysis)
+@lru_cache(maxsize=1)
+def _prompt_tokens() -> Tuple[int, int]:
+    """Tokens des prompts d'analyse (un article, un lot) ; le premier comptage peut charger le vocabulaire de tiktoken."""
+    return count_tokens(ANALYSIS_PROMPT_TEMPLATE), count_tokens(ANALYSIS_BATCH_PROMPT_TEMPLATE)
+
+class _SingleAnalyzer:
+    def __init__(self, chain, scheduler: LLMScheduler, metrics: RunMetrics, prompt_tokens: int):
+        self._chain = chain
+        self._scheduler = scheduler
+        self._metrics = metrics
+        self._base_tokens = prompt_tokens + _OUTPUT_TOKENS_PER_ARTICLE
+
+    async def analyze(self, text: str, tokens: int) -> ArticleAnalysis:
+
+        async def invoke():
+            with self._metrics.time_stage("llm"):
+                return await self._chain.ainvoke({"content": text})
+
+        response = await self._scheduler.call(invoke, self._base_tokens + tokens)
+        self._metrics.record_llm_call(_usage(response))
+        if response.get("parsed") is None:
+            raise response.get("parsing_error") or ValueError("Réponse structurée vide")
+        return response["parsed"]
+
+class _BatchAnalyzer:
+    """Regroupe les articles prêts en lots qui tiennent dans le budget de tokens.
+
+    Un lot part dès qu'il est plein ou après LLM_BATCH_LINGER secondes d'attente. Les articles
+    absents ou invalides dans la réponse sont ré-analysés un par un.
+    """
+
+    def __init__(self, batch_chain, single: _SingleAnalyzer, scheduler: LLMScheduler, metrics: RunMetrics,
+                 prompt_tokens: int):
+        self._batch_chain = batch_chain
+        self._single = single
+        self._scheduler = scheduler
+        self._metrics = metrics
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._max_articles = max(1, min(LLM_BATCH_MAX_ARTICLES, LLM_BATCH_OUTPUT_BUDGET // _OUTPUT_TOKENS_PER_ARTICLE))
+        self._base_tokens = prompt_tokens
+
+    async def analyze(self, text: str, tokens: int) -> ArticleAnalysis:
+        loop = asyncio.get_running_loop()
+        if self._pending and self._base_tokens + self._pending_tokens + tokens > LLM_BATCH_TOKEN_BUDGET:
+            self._flush()
+        future = loop.create_future()
+        self._pending.append((text, tokens, future))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self._max_articles:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(LLM_BATCH_LINGER, self._flush)
+        return await future
 
-    all_analyzed_articles: List[AnalyzedArticle] = []
-    for article in unique_articles_list:
-        # Template d'erreur mis à jour avec les nouveaux champs
-        base_article_data: AnalyzedArticle = {**article, "content": None, "date": None, "resume_neutre": None, "problematique_generale": None, "impact_afrique": None, "problematique_africaine": None, "eveil_de_conscience": None, "piste_opportunite": None, "score_pertinence": None, "error": None}
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, int, asyncio.Future]]) -> None:
+        results: Dict[str, ArticleAnalysis] = {}
+        if len(batch) > 1:
+            articles = "\n\n".join(f'<article id="{i}">{text}</article>' for i, (text, _, _) in enumerate(batch))
+
+            async def invoke():
+                with self._metrics.time_stage("llm_batch"):
+                    return await self._batch_chain.ainvoke({"articles": articles})
+
+            try:
+                estimated = self._base_tokens + sum(tokens for _, tokens, _ in batch) + len(batch) * _OUTPUT_TOKENS_PER_ARTICLE
+                response = await self._scheduler.call(invoke, estimated)
+                self._metrics.record_llm_call(_usage(response), kind="batch")
+                results = _parse_batch_response(response)
+                print(f"Lot de {len(batch)} articles analysé ({len(results)} analyses valides).")
+            except RunDeadlineExceeded as e:
+                # Pas de repli article par article après l'échéance
+                for _, _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                return
+            except Exception as e:
+                print(f"ERREUR lors de l'analyse d'un lot de {len(batch)} articles: {e}")
+
+        async def resolve(index: int, text: str, tokens: int, future: asyncio.Future) -> None:
+            if future.done():
+                return
+            try:
+                # Repli article par article uniquement pour les éléments manquants ou invalides
+                analysis = results.get(str(index))
+                if analysis is None:
+                    if len(batch) > 1: self._metrics.record_retry("batch_fallback")
+                    analysis = await self._single.analyze(text, tokens)
+                if not future.done(): future.set_result(analysis)
+            except Exception as e:
+                if not future.done(): future.set_exception(e)
+
+        await asyncio.gather(*(resolve(i, text, tokens, future) for i, (text, tokens, future) in enumerate(batch)))
+
+def _parse_batch_response(response: Dict) -> Dict[str, ArticleAnalysis]:
+    # Validation élément par élément : un élément invalide n'invalide pas tout le lot
+    parsed = response.get("parsed")
+    if parsed is not None:
+        items = [item.model_dump() for item in parsed.analyses]
+    else:
+        tool_calls = getattr(response.get("raw"), "tool_calls", None) or []
+        items = (tool_calls[0].get("args", {}).get("analyses") or []) if tool_calls else []
+    results: Dict[str, ArticleAnalysis] = {}
+    for item in items:
+        if not isinstance(item, dict) or "article_id" not in item:
+            continue
         try:
-            downloaded = trafilatura.fetch_url(article['url'])
-            if not downloaded:
-                base_article_data["error"] = "Téléchargement échoué"
-                all_analyzed_articles.append(base_article_data); continue
-            
-            content = trafilatura.extract(downloaded, favor_recall=True)
-            date = trafilatura.extract_metadata(downloaded).date if trafilatura.extract_metadata(downloaded) else "N/A"
-            
-            if content and len(content) > 250:
-                try:
-                    analysis_result_object = analysis_chain.invoke({"content": content[:8000]})
-                    analysis_result_dict = analysis_result_object.dict()
-                    full_article: AnalyzedArticle = {**base_article_data, "content": content, "date": date, **analysis_result_dict, "error": None}
-                    all_analyzed_articles.append(full_article)
-                except Exception as llm_error:
-                    base_article_data.update({"content": content, "date": date, "error": f"Erreur du LLM: {llm_error}"})
-                    all_analyzed_articles.append(base_article_data)
-            else:
-                base_article_data.update({"content": content, "date": date, "error": "Contenu insuffisant"})
-                all_analyzed_articles.append(base_article_data)
-        except Exception as e:
-            base_article_data["error"] = f"Erreur d'extraction: {e}"
-            all_analyzed_articles.append(base_article_data)
-
-    # Le tri reste le même
+            results[str(item["article_id"]).strip()] = ArticleAnalysis.model_validate(item)
+        except ValidationError:
+            continue
+    return results
+
+@dataclass
+class _PipelineContext:
+    analyzer: Any
+    http: SharedHttpClient
+    download_semaphore: asyncio.Semaphore
+    metrics: RunMetrics
+    cache: Optional[AnalysisCache] = None
+    blobs: Optional[BlobStore] = None
+    emit: Callable[[Dict], None] = lambda event: None
+    # Échéance du run (time.monotonic) : seule limite de l'attente d'une place de téléchargement
+    deadline: Optional[float] = None
+
+@dataclass
+class _PreparedArticle:
+    # Article téléchargé et extrait, en attente d'analyse (ou déjà analysé d'après le cache)
+    article: FoundArticle
+    content: Optional[str] = None
+    date: Optional[str] = None
+    analysis: Optional[Dict] = None
+    error: Optional[str] = None
+    # Longueur et fréquences des termes de la requête (relevance.document_stats), calculées à l'extraction
+    relevance_stats: Optional[Tuple[int, Dict[str, int]]] = None
+    relevance_score: Optional[float] = None
+    content_tokens: Optional[int] = None
+
+    def to_result(self) -> AnalyzedArticle:
+        return {**_empty_analyzed_article(self.article), "date": self.date, **(self.analysis or {}),
+                "relevance_score": self.relevance_score, "content_tokens": self.content_tokens, "error": self.error}
+
+async def _prepare_article(article: FoundArticle, ctx: _PipelineContext) -> _PreparedArticle:
+    prepared = _PreparedArticle(article)
+    try:
+        cached = ctx.cache.get(article['url'], ANALYSIS_VERSION) if ctx.cache else None
+        if cached:
+            ctx.metrics.record_cache("hit")
+            prepared.content, prepared.date, prepared.analysis = cached.content, cached.date, cached.analysis
+            return prepared
+
+        remaining = None if ctx.deadline is None else max(0.0, ctx.deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(ctx.download_semaphore.acquire(), timeout=remaining)
+        except asyncio.TimeoutError:
+            prepared.error = _SKIPPED
+            return prepared
+        try:
+            # ARTICLE_TIMEOUT ne compte que le téléchargement lui-même, pas l'attente d'une place
+            with ctx.metrics.time_stage("download"):
+                fetched: FetchResult = await asyncio.wait_for(
+                    ctx.http.fetch(article['url'], html_only=True, min_bytes=MIN_CONTENT_CHARS), timeout=ARTICLE_TIMEOUT)
+        finally:
+            ctx.download_semaphore.release()
+        ctx.metrics.record_http(fetched.status)
+        if fetched.rejected:
+            # Rejet sur les en-têtes : le corps n'a pas été téléchargé
+            prepared.error = _NOT_HTML if fetched.rejected == "content_type" else _INSUFFICIENT_CONTENT
+            return prepared
+        if not fetched.ok or not fetched.text:
+            prepared.error = "Téléchargement échoué"
+            return prepared
+        if fetched.not_modified and fetched.parsed is not None:
+            # Page inchangée (304) : pas de nouvelle extraction
+            content, date = fetched.parsed["content"], fetched.parsed["date"]
+        else:
+            # Le HTML n'est gardé que le temps de l'extraction
+            with ctx.metrics.time_stage("extract"):
+                content, date = await asyncio.wait_for(_extract_in_pool(fetched.text), timeout=ARTICLE_TIMEOUT)
+            ctx.http.remember_parsed(article['url'], {"content": content, "date": date})
+        prepared.content, prepared.date = content, date
+        if not content or len(content) <= MIN_CONTENT_CHARS:
+            prepared.error = _INSUFFICIENT_CONTENT
+    except asyncio.TimeoutError:
+        prepared.error = _timeout_error(article)
+    except Exception as e:
+        prepared.error = f"Erreur d'extraction: {e}"
+    return prepared
+
+async def _extract_in_pool(html: str) -> Tuple[Optional[str], str]:
+    # Pool relu à chaque extraction : après la mort d'un processus, le pool recréé sert aussi au run en cours
+    pool = get_extract_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, extract_document, html)
+    except BrokenProcessPool:
+        # Le pool cassé est remplacé (une seule fois, quel que soit le nombre d'extractions touchées),
+        # puis l'extraction est retentée une fois sur le nouveau pool
+        reset_extract_pool(pool)
+        return await asyncio.get_running_loop().run_in_executor(get_extract_pool(), extract_document, html)
+
+async def _analyze_prepared(prepared: _PreparedArticle, ctx: _PipelineContext) -> AnalyzedArticle:
+    if prepared.error or prepared.analysis is not None:
+        return prepared.to_result()
+    article = prepared.article
+    content_hash = content_fingerprint(prepared.content)
+    cached = ctx.cache.get_by_content(article['url'], content_hash, ANALYSIS_VERSION) if ctx.cache else None
+    if ctx.cache:
+        ctx.metrics.record_cache("revalidated" if cached else "miss")
+    if cached:
+        prepared.analysis = cached.analysis
+        return prepared.to_result()
+    try:
+        # Chapeau, paragraphes saillants et conclusion, dans le budget de tokens par article
+        text, prepared.content_tokens, original_tokens = await asyncio.to_thread(condense, prepared.content)
+        ctx.metrics.record_content_tokens(original_tokens, prepared.content_tokens)
+        analysis_result_object = await ctx.analyzer.analyze(text, prepared.content_tokens)
+        prepared.analysis = analysis_result_object.dict()
+        print(f"Article analysé : {article['url']}")
+        if ctx.cache:
+            # Le cache ne relit jamais le HTML : seuls le texte extrait et l'analyse sont conservés
+            ctx.cache.put(article['url'], ANALYSIS_VERSION, content_hash, None, prepared.content,
+                          prepared.date, prepared.analysis)
+    except RunDeadlineExceeded:
+        prepared.error = _SKIPPED
+    except Exception as llm_error:
+        prepared.error = f"Erreur du LLM: {llm_error}"
+    return prepared.to_result()
+
+def _timeout_error(article: FoundArticle) -> str:
+    print(f"Délai dépassé pour {article['url']}")
+    return f"Délai dépassé ({ARTICLE_TIMEOUT:.0f}s)"
+
+async def _analyze_article(prepared: _PreparedArticle, duplicates: List[FoundArticle],
+                           ctx: _PipelineContext) -> AnalyzedArticle:
+    # Pas de délai global ici : chaque appel LLM est borné par l'ordonnanceur (LLM_CALL_TIMEOUT),
+    # et l'attente d'une place seulement par l'échéance du run
+    result = await _analyze_prepared(prepared, ctx)
+    if prepared.content and ctx.blobs:
+        result["content_id"] = ctx.blobs.put(prepared.content)
+    # Le texte n'est plus nécessaire une fois l'article traité
+    prepared.content = None
+    if duplicates:
+        result["corroborating_sources"] = _corroborating_sources(duplicates)
+    ctx.metrics.record_article(result.get("error"))
+    ctx.emit({"type": "article_analyzed", "article": result})
+    return result
+
+def _corroborating_sources(duplicates: List[FoundArticle]) -> List[Dict]:
+    return [{"title": dup['title'], "url": dup['url'], "source": dup['source']} for dup in duplicates]
+
+class _AnalysisDispatcher:
+    """Envoie chaque article à l'analyse dès son extraction, sans attendre les plus lents.
+
+    Un article extrait est comparé aux représentants déjà retenus (LSH incrémental), y compris
+    ceux du classement précédent en mode incrémental : un quasi-doublon rejoint les sources
+    concordantes de son représentant, sans appel au LLM.
+    Avec une limite de pertinence (TOP_K, MIN_SCORE), le classement BM25 porte sur tous les
+    articles : l'analyse attend alors la fin des extractions.
+    """
+
+    def __init__(self, query: str, ctx: _PipelineContext, previous_articles: List[AnalyzedArticle] = (),
+                 previous_signatures: Optional[Mapping[str, bytes]] = None):
+        self._ctx = ctx
+        self._terms = query_terms(query) if RELEVANCE_FILTER_ENABLED else set()
+        self._index = NearDuplicateIndex() if DEDUP_ENABLED else None
+        # Rang dans l'index LSH -> doublons rattachés à ce représentant
+        self._indexed: List[List[FoundArticle]] = []
+        self.groups: List[Tuple[_PreparedArticle, List[FoundArticle]]] = []
+        # Nouveaux doublons des articles déjà classés, par URL normalisée du représentant
+        self.previous_duplicates: Dict[str, List[FoundArticle]] = {}
+        # Signatures des nouveaux représentants, conservées pour les runs suivants
+        self.signatures: Dict[str, bytes] = {}
+        self._tasks: List[asyncio.Task] = []
+        if self._index is not None:
+            for article in previous_articles:
+                url = normalize_url(article['url'])
+                data = (previous_signatures or {}).get(url)
+                if data is not None and self._index.add(decode_signature(data)) is None:
+                    self.previous_duplicates[url] = []
+                    self._indexed.append(self.previous_duplicates[url])
+
+    def _fingerprint(self, prepared: _PreparedArticle):
+        signature = document_signature(f"{prepared.article['title']}\n{prepared.content}") if self._index is not None else None
+        stats = document_stats(self._terms, f"{prepared.article['title']}\n{prepared.article['title']}\n{prepared.content}") if self._terms else None
+        return signature, stats
+
+    async def add(self, article: FoundArticle) -> None:
+        prepared = await _prepare_article(article, self._ctx)
+        duplicates: List[FoundArticle] = []
+        if not prepared.error and (self._index is not None or self._terms):
+            signature, prepared.relevance_stats = await asyncio.to_thread(self._fingerprint, prepared)
+            if self._index is not None:
+                match = self._index.add(signature)
+                if match is not None:
+                    # Quasi-doublon : son texte est libéré aussitôt
+                    self._indexed[match].append(prepared.article)
+                    return
+                self._indexed.append(duplicates)
+                self.signatures[article['url']] = encode_signature(signature)
+        self.groups.append((prepared, duplicates))
+        if not RELEVANCE_LIMITED:
+            self._tasks.append(asyncio.create_task(_analyze_article(prepared, self.groups[-1][1], self._ctx)))
+
+    def _score(self) -> int:
+        # Score BM25 de chaque représentant ; avec une limite, les moins proches de la requête sont marqués hors sujet
+        candidates = [prepared for prepared, _ in self.groups if prepared.relevance_stats is not None]
+        if not candidates:
+            return 0
+        scores = bm25_from_stats([prepared.relevance_stats for prepared in candidates])
+        kept = set(select_relevant(scores)) if RELEVANCE_LIMITED else set(range(len(candidates)))
+        for index, prepared in enumerate(candidates):
+            prepared.relevance_score = round(float(scores[index]), 3)
+            prepared.relevance_stats = None
+            if index not in kept:
+                prepared.error = _OFF_TOPIC
+        return len(candidates) - len(kept)
+
+    async def results(self) -> Tuple[List[AnalyzedArticle], int]:
+        """Résultats de tous les groupes, une fois tous les articles ajoutés, et nombre d'articles hors sujet."""
+        off_topic_count = self._score()
+        if RELEVANCE_LIMITED:
+            self._tasks = [asyncio.create_task(_analyze_article(prepared, duplicates, self._ctx))
+                           for prepared, duplicates in self.groups]
+        results = await asyncio.gather(*self._tasks)
+        # Les doublons et le score peuvent être arrivés après l'analyse du représentant
+        for (prepared, duplicates), result in zip(self.groups, results):
+            result["relevance_score"] = prepared.relevance_score
+            if duplicates:
+                result["corroborating_sources"] = _corroborating_sources(duplicates)
+        return results, off_topic_count
+
+    def duplicates(self) -> List[FoundArticle]:
+        return [dup for duplicates in self._indexed for dup in duplicates]
+
+    def cancel(self) -> None:
+        # Run interrompu (échéance, annulation) : les analyses déjà lancées ne lui survivent pas
+        for task in self._tasks:
+            task.cancel()
+
+def _ranking_key(article: AnalyzedArticle) -> Tuple[int, float]:
+    # Score stratégique du LLM d'abord ; à score égal, l'article le plus proche de la requête (BM25)
+    return article.get("score_pertinence") or 0, article.get("relevance_score") or 0.0
+
+def build_final_report(query: str, all_analyzed_articles: List[AnalyzedArticle]) -> str:
     articles_with_score = [article for article in all_analyzed_articles if not article.get("error")]
-    articles_with_score.sort(key=lambda x: x.get("score_pertinence", 0), reverse=True)
+    articles_with_score.sort(key=_ranking_key, reverse=True)
     print(f"Classement de {len(articles_with_score)} articles analysés par score de pertinence.")
 
-    # NOUVELLE CONSTRUCTION DU RAPPORT ENRICHI
     if not articles_with_score:
-        final_report = "# Rapport de Veille Stratégique pour l'Afrique\n\nAucun article n'a pu être analysé avec succès."
-    else:
-        report_parts = [f"# Rapport de Veille Stratégique pour l'Afrique : {state['query']}\n"]
-        for article in articles_with_score:
-            score = article.get('score_pertinence')
-            score_emoji = "🔥" * (score // 2) + "⚫️" * ((10 - score) // 2) if score else "N/A"
-
-            report_parts.append(f"--- \n\n## {article['title']}")
-            report_parts.append(f"**Source:** {article.get('source', 'N/A')} | **Date:** {article.get('date', 'N/A')}")
-            
-            # --- Partie 1: Contexte Global ---
-            report_parts.append(f"\n### Contexte Global")
-            report_parts.append(f"**📝 Résumé :** {article.get('resume_neutre', 'N/A')}")
-            report_parts.append(f"**🌐 Problématique Générale :** {article.get('problematique_generale', 'N/A')}")
-
-            # --- Partie 2: Analyse pour l'Afrique ---
-            report_parts.append(f"\n### Analyse Stratégique pour l'Afrique")
-            report_parts.append(f"**Score de Pertinence : {score}/10** {score_emoji}")
-            report_parts.append(f"**🌍 Impact :** {article.get('impact_afrique', 'N/A')}")
-            report_parts.append(f"**🤔 Problématique Révélée :** {article.get('problematique_africaine', 'N/A')}")
-            report_parts.append(f"> **💡 Éveil de Conscience :** {article.get('eveil_de_conscience', 'N/A')}")
-            report_parts.append(f"**🚀 Piste d'Opportunité :** {article.get('piste_opportunite', 'N/A')}")
-            
-            report_parts.append(f"\n_[Lien vers l'article]({article['url']})_")
-        final_report = "\n\n".join(report_parts)
+        return "# Rapport de Veille Stratégique pour l'Afrique\n\nAucun article n'a pu être analysé avec succès."
+
+    report_parts = [f"# Rapport de Veille Stratégique pour l'Afrique : {query}\n"]
+    for article in articles_with_score:
+        score = article.get('score_pertinence')
+        score_emoji = "🔥" * (score // 2) + "⚫️" * ((10 - score) // 2) if score else "N/A"
+
+        new_marker = "🆕 " if article.get("is_new") else ""
+        report_parts.append(f"--- \n\n## {new_marker}{article['title']}")
+        report_parts.append(f"**Source:** {article.get('source', 'N/A')} | **Date:** {article.get('date', 'N/A')}")
+
+        # --- Partie 1: Contexte Global ---
+        report_parts.append(f"\n### Contexte Global")
+        report_parts.append(f"**📝 Résumé :** {article.get('resume_neutre', 'N/A')}")
+        report_parts.append(f"**🌐 Problématique Générale :** {article.get('problematique_generale', 'N/A')}")
+
+        # --- Partie 2: Analyse pour l'Afrique ---
+        report_parts.append(f"\n### Analyse Stratégique pour l'Afrique")
+        report_parts.append(f"**Score de Pertinence : {score}/10** {score_emoji}")
+        report_parts.append(f"**🌍 Impact :** {article.get('impact_afrique', 'N/A')}")
+        report_parts.append(f"**🤔 Problématique Révélée :** {article.get('problematique_africaine', 'N/A')}")
+        report_parts.append(f"> **💡 Éveil de Conscience :** {article.get('eveil_de_conscience', 'N/A')}")
+        report_parts.append(f"**🚀 Piste d'Opportunité :** {article.get('piste_opportunite', 'N/A')}")
+
+        if article.get("corroborating_sources"):
+            links = ", ".join(f"[{dup['title']}]({dup['url']})" for dup in article["corroborating_sources"])
+            report_parts.append(f"**🔗 Sources concordantes :** {links}")
+
+        report_parts.append(f"\n_[Lien vers l'article]({article['url']})_")
+    return "\n\n".join(report_parts)
+
+def _with_new_sources(article: AnalyzedArticle, duplicates: List[FoundArticle]) -> AnalyzedArticle:
+    # Un article déjà classé reçoit comme sources concordantes les reprises de son histoire parues depuis
+    known = {normalize_url(source['url']) for source in article.get("corroborating_sources") or []}
+    added = [source for source in _corroborating_sources(duplicates) if normalize_url(source['url']) not in known]
+    return {**article, "corroborating_sources": (article.get("corroborating_sources") or []) + added} if added else article
+
+def _merge_incremental(run_state: RunStateStore, query: str, previous_articles: List[AnalyzedArticle],
+                       new_articles: List[AnalyzedArticle],
+                       previous_duplicates: Optional[Mapping[str, List[FoundArticle]]] = None,
+                       signatures: Optional[Mapping[str, bytes]] = None) -> List[AnalyzedArticle]:
+    # Les nouveaux articles rejoignent le classement précédent, sans ré-analyser l'existant
+    now = time.time()
+    new_articles = [{**article, "is_new": True, "first_seen": now} for article in new_articles]
+    new_urls = {normalize_url(article['url']) for article in new_articles}
+    previous_duplicates = previous_duplicates or {}
+    merged = new_articles + [
+        _with_new_sources({**article, "is_new": False}, previous_duplicates.get(normalize_url(article['url'])) or [])
+        for article in previous_articles if normalize_url(article['url']) not in new_urls]
+    # Les échecs transitoires (téléchargement, LLM, délai) seront retentés au prochain run
+    done = [article for article in new_articles if article.get("error") in (None, _INSUFFICIENT_CONTENT, _NOT_HTML)]
+    run_state.mark_seen(query, done)
+    # Les doublons suivent leur représentant : retenté, il les retrouvera comme sources concordantes
+    run_state.mark_seen(query, [source for article in done for source in article.get("corroborating_sources") or []])
+    # Les reprises d'une histoire déjà classée ne reviennent pas au run suivant
+    run_state.mark_seen(query, [dup for duplicates in previous_duplicates.values() for dup in duplicates])
+    ranked = [article for article in merged if not article.get("error")]
+    run_state.save_ranked(query, ranked)
+    # Signatures des nouveaux articles classés : leurs reprises des runs suivants y seront rattachées
+    ranked_urls = {normalize_url(article['url']) for article in ranked}
+    run_state.save_signatures(query, {url: signature for url, signature in (signatures or {}).items()
+                                      if normalize_url(url) in ranked_urls})
+    run_state.prune()
+    return merged
+
+async def extract_analyze_and_report(state: AgentState, config: "RunnableConfig", writer: "StreamWriter") -> dict:
+    print("\n--- NŒUD FINAL : Extraction, Analyse et Rapport ---")
+    metrics = _run_metrics(config)
+    with metrics.time_node("aggregate_and_report"):
+        return await _extract_analyze_and_report(state, config, writer, metrics)
+
+async def _extract_analyze_and_report(state: AgentState, config: "RunnableConfig", writer: "StreamWriter", metrics: RunMetrics) -> dict:
+    all_found_articles = state.get("found_articles", [])
+    unique_articles_list = list({article['url']: article for article in all_found_articles}.values())
+
+    run_state: Optional[RunStateStore] = config.get("configurable", {}).get("run_state")
+    previous_articles: List[AnalyzedArticle] = []
+    previous_signatures: Dict[str, bytes] = {}
+    if run_state:
+        previous_articles = run_state.load_ranked(state['query'])
+        if DEDUP_ENABLED:
+            previous_signatures = run_state.load_signatures(state['query'], [article['url'] for article in previous_articles])
+        seen = run_state.seen_urls(state['query'], {article['source'] for article in unique_articles_list})
+        unique_articles_list = [article for article in unique_articles_list if normalize_url(article['url']) not in seen]
+        print(f"Mode incrémental : {len(unique_articles_list)} nouveaux articles, {len(previous_articles)} déjà classés.")
+
+    if not unique_articles_list and not previous_articles:
+        return {"final_report": "Aucun article trouvé.", "analyzed_articles": []}
+    print(f"Traitement de {len(unique_articles_list)} articles uniques.")
+
+    # Le modèle peut être remplacé pour un run (ex: modèle factice des benchmarks)
+    chat_model = config.get("configurable", {}).get("llm") or get_llm()
+    analysis_prompt, batch_prompt = _analysis_prompts()
+    analysis_chain = analysis_prompt | chat_model.with_structured_output(ArticleAnalysis, include_raw=True)
+    scheduler = LLMScheduler(LLM_CONCURRENCY, deadline=config.get("configurable", {}).get("deadline"),
+                             usage_of=_total_tokens, on_retry=metrics.record_retry)
+    # Hors de la boucle : le premier comptage de tokens peut charger (voire télécharger) un vocabulaire
+    single_prompt_tokens, batch_prompt_tokens = await asyncio.to_thread(_prompt_tokens)
+    analyzer = _SingleAnalyzer(analysis_chain, scheduler, metrics, single_prompt_tokens)
+    if LLM_BATCH_MODE:
+        batch_chain = batch_prompt | chat_model.with_structured_output(ArticleAnalysisBatch, include_raw=True)
+        analyzer = _BatchAnalyzer(batch_chain, analyzer, scheduler, metrics, batch_prompt_tokens)
+
+    # Limites séparées : téléchargements (I/O), extraction (CPU, pool de processus partagé) et appels LLM
+    async with _http_client(config) as http:
+        ctx = _PipelineContext(
+            analyzer=analyzer, http=http, download_semaphore=asyncio.Semaphore(DOWNLOAD_CONCURRENCY),
+            metrics=metrics,
+            cache=config.get("configurable", {}).get("analysis_cache"),
+            blobs=config.get("configurable", {}).get("blob_store"), emit=writer,
+            deadline=config.get("configurable", {}).get("deadline"),
+        )
+        dispatcher = _AnalysisDispatcher(state['query'], ctx, previous_articles, previous_signatures)
+        try:
+            await asyncio.gather(*(dispatcher.add(article) for article in unique_articles_list))
+            all_analyzed_articles, off_topic_count = await dispatcher.results()
+        finally:
+            dispatcher.cancel()
+        duplicate_articles = dispatcher.duplicates()
+        if duplicate_articles:
+            metrics.record_duplicates(len(duplicate_articles))
+            print(f"{len(duplicate_articles)} quasi-doublons regroupés : {len(dispatcher.groups)} articles analysés.")
+        if off_topic_count:
+            metrics.record_off_topic(off_topic_count)
+            print(f"{off_topic_count} articles écartés car hors sujet pour la requête '{state['query']}'.")
+    metrics.llm_scheduler = scheduler.stats()
+    if scheduler.skipped:
+        print(f"Échéance du run atteinte : {scheduler.skipped} analyses ignorées.")
+
+    if run_state:
+        all_analyzed_articles = _merge_incremental(run_state, state['query'], previous_articles, all_analyzed_articles,
+                                                   dispatcher.previous_duplicates, dispatcher.signatures)
 
+    final_report = build_final_report(state['query'], all_analyzed_articles)
     return {"final_report": final_report, "analyzed_articles": all_analyzed_articles}
+
 # --- Construction du Graphe ---
 def create_langgraph_app():
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.types import Send, StreamWriter
+    # LangGraph résout les annotations des nœuds (schéma d'entrée, injection de config/writer)
+    # dans ce module : les types chargés à la demande y sont publiés avant la construction
+    globals().update(RunnableConfig=RunnableConfig, Send=Send, StreamWriter=StreamWriter)
     graph = StateGraph(AgentState)
-    graph.add_node("planner", plan_next_site)
-    graph.add_node("dispatcher", scraper_dispatcher)
+    graph.add_node("scrape_site", scrape_site)
     graph.add_node("aggregate_and_report", extract_analyze_and_report)
-    graph.set_entry_point("planner")
-    graph.add_conditional_edges("planner", should_continue, {"continue_scraping": "dispatcher", "end_scraping": "aggregate_and_report"})
-    graph.add_edge("dispatcher", "planner")
+    graph.add_conditional_edges(START, fan_out_sites, ["scrape_site"])
+    graph.add_edge("scrape_site", "aggregate_and_report")
     graph.add_edge("aggregate_and_report", END)
     return graph.compile()
 
-langgraph_app = create_langgraph_app()
+@lru_cache(maxsize=1)
+def get_langgraph_app():
+    """Graphe compilé une fois par processus, au premier run."""
+    return create_langgraph_app()
+
+@lru_cache(maxsize=1)
+def _analysis_prompts():
+    from langchain_core.prompts import ChatPromptTemplate
+    return (ChatPromptTemplate.from_template(ANALYSIS_PROMPT_TEMPLATE),
+            ChatPromptTemplate.from_template(ANALYSIS_BATCH_PROMPT_TEMPLATE))
+
+def warm_backend() -> None:
+    """Charge à l'avance ce que le premier run chargerait à la demande : graphe, prompts, tokenizer, client LLM, pile HTTP."""
+    get_langgraph_app()
+    _analysis_prompts()
+    _prompt_tokens()
+    if DEEPSEEK_API_KEY:
+        get_llm()
+    # httpx n'importe son transport (httpcore) qu'à la création du premier client
+    httpx.AsyncHTTPTransport()
+
+def __getattr__(name: str):
+    # Compatibilité : `scraap.llm` et `scraap.langgraph_app` restent accessibles, construits à la demande
+    if name == "llm":
+        return get_llm()
+    if name == "langgraph_app":
+        return get_langgraph_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Runner ---
-async def run_veile_workflow(query: str) -> Dict:
-    initial_state = {
+def _initial_state(query: str) -> Dict:
+    return {
         "query": query, "sites_to_process": list(SCRAPER_REGISTRY.keys()),
         "found_articles": [], "analyzed_articles": [], "final_report": "", "error_message": None
     }
+
+@asynccontextmanager
+async def _run_resources(incremental: bool, chat_model=None) -> AsyncIterator[Dict]:
+    # Ressources propres à un run, transmises aux nœuds via config["configurable"]
+    analysis_cache = AnalysisCache() if CACHE_ENABLED else None
+    # Mode incrémental : seuls les articles jamais vus sont téléchargés et analysés
+    run_state = RunStateStore() if incremental else None
+    blob_store = BlobStore()
+    try:
+        # Un seul client HTTP (pool de connexions) partagé par toutes les branches du run
+        async with _new_http_client() as http_client:
+            yield {"http_client": http_client, "analysis_cache": analysis_cache, "run_state": run_state,
+                   "blob_store": blob_store, "metrics": RunMetrics(), "llm": chat_model,
+                   "deadline": time.monotonic() + RUN_DEADLINE if RUN_DEADLINE > 0 else None}
+    finally:
+        blob_store.prune()
+        blob_store.close()
+        if analysis_cache:
+            analysis_cache.evict()
+            analysis_cache.close()
+        if run_state:
+            run_state.close()
+
+def _run_summary(configurable: Dict, analyzed_articles: Optional[List[AnalyzedArticle]], incremental: bool) -> Dict:
+    summary = {}
+    if incremental:
+        summary["new_articles_count"] = sum(1 for article in analyzed_articles or [] if article.get("is_new") and not article.get("error"))
+    if configurable.get("analysis_cache"):
+        summary["cache_stats"] = configurable["analysis_cache"].stats()
+        print(f"Cache : {summary['cache_stats']}")
+    summary["run_metrics"] = configurable["metrics"].summary()
+    return summary
+
+async def run_veile_workflow(query: str, incremental: bool = False, chat_model=None) -> Dict:
+    try:
+        async with _run_resources(incremental, chat_model) as configurable:
+            final_state = await get_langgraph_app().ainvoke(_initial_state(query), {"configurable": configurable})
+            result = {
+                "final_report": final_state.get("final_report"),
+                "analyzed_articles": final_state.get("analyzed_articles"),
+                "error_message": final_state.get("error_message")
+            }
+            result.update(_run_summary(configurable, result["analyzed_articles"], incremental))
+        return result
+    except Exception as e:
+        print(f"ERREUR CRITIQUE DANS LE WORKFLOW: {e}")
+        return {"error_message": f"Erreur critique du workflow: {e}"}
+
+async def stream_veile_workflow(query: str, incremental: bool = False, chat_model=None) -> AsyncIterator[Dict]:
+    """Version en flux de run_veile_workflow : un événement par site scrapé, par article analysé, puis le classement final."""
     try:
-        final_state = await langgraph_app.ainvoke(initial_state, {"recursion_limit": 15})
-        return {
-            "final_report": final_state.get("final_report"),
-            "analyzed_articles": final_state.get("analyzed_articles"),
-            "error_message": final_state.get("error_message")
-        }
+        async with _run_resources(incremental, chat_model) as configurable:
+            async for mode, chunk in get_langgraph_app().astream(_initial_state(query), {"configurable": configurable},
+                                                                 stream_mode=["custom", "updates"]):
+                if mode == "custom":
+                    yield chunk
+                elif "aggregate_and_report" in chunk:
+                    final_update = chunk["aggregate_and_report"] or {}
+                    analyzed_articles = final_update.get("analyzed_articles") or []
+                    ranking = sorted((article for article in analyzed_articles if not article.get("error")),
+                                     key=_ranking_key, reverse=True)
+                    yield {
+                        "type": "final_ranking",
+                        "final_report": final_update.get("final_report"),
+                        "ranking": ranking,
+                        "articles_total": len(analyzed_articles),
+                        **_run_summary(configurable, analyzed_articles, incremental),
+                    }
     except Exception as e:
         print(f"ERREUR CRITIQUE DANS LE WORKFLOW: {e}")
-        return {"error_message": f"Erreur critique du workflow: {e}"}
\ No newline at end of file
+        yield {"type": "error", "error_message": f"Erreur critique du workflow: {e}"}
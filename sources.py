@@ -0,0 +1,146 @@
+# sources.py
+"""
+Sources de la veille, décrites dans `sources.json` plutôt qu'en code.
+
+Chaque source est soit une page HTML (sélecteur CSS des liens d'articles, règles
+d'extraction du titre et de l'URL), soit un flux RSS/Atom, bien moins coûteux à analyser.
+Les sélecteurs sont compilés une fois, au chargement. Les pages sont analysées avec
+selectolax (lexbor) s'il est installé, sinon avec lxml ; les flux avec lxml.
+
+Règles d'extraction : "text" (texte du lien) ou "@attribut" (ex : "@href", "@title").
+Champ optionnel "timeout" : délai propre à la page d'accueil de la source, en secondes.
+Ajouter une source ne demande qu'une entrée de plus dans le fichier :
+    {"name": "TechCabal", "url": "https://techcabal.com/feed/", "type": "feed"}
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import lxml.html
+from lxml import etree
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+SOURCES_PATH = os.getenv("SCRAAPY_SOURCES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json"))
+HTML_ENGINE = os.getenv("SCRAAPY_HTML_PARSER", "selectolax" if SELECTOLAX_AVAILABLE else "lxml").lower()
+
+SOURCE_HTML = "html"
+SOURCE_FEED = "feed"
+
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+_FEED_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=False)
+_FEED_ITEMS = etree.XPath("//*[local-name()='item' or local-name()='entry']")
+_FEED_TITLE = etree.XPath("string(*[local-name()='title'])")
+_FEED_LINKS = etree.XPath("*[local-name()='link']")
+
+
+def _is_ignored(url: str, domains: Tuple[str, ...]) -> bool:
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+@dataclass
+class Source:
+    name: str
+    url: str
+    type: str = SOURCE_HTML
+    selector: Optional[str] = None
+    title: str = "text"
+    href: str = "@href"
+    ignore_domains: Tuple[str, ...] = ()
+    # Délai de la page d'accueil en secondes ; None : SCRAAPY_SITE_TIMEOUT
+    timeout: Optional[float] = None
+    _matcher: Any = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.type not in (SOURCE_HTML, SOURCE_FEED):
+            raise ValueError(f"Type de source inconnu pour {self.name} : '{self.type}'")
+        if self.type == SOURCE_HTML:
+            if not self.selector:
+                raise ValueError(f"La source HTML {self.name} n'a pas de sélecteur")
+            if HTML_ENGINE != "selectolax":
+                # Compilation unique du sélecteur CSS en XPath (cssselect)
+                from lxml.cssselect import CSSSelector
+                self._matcher = CSSSelector(self.selector)
+        self.ignore_domains = tuple(self.ignore_domains)
+        if self.timeout is not None and self.timeout <= 0:
+            raise ValueError(f"Délai invalide pour {self.name} : {self.timeout}")
+
+    @property
+    def fingerprint(self) -> str:
+        """Empreinte des règles : une liste extraite avec d'autres règles n'est pas réutilisée."""
+        rules = [self.type, self.selector, self.title, self.href, *self.ignore_domains]
+        return hashlib.sha256(json.dumps(rules).encode("utf-8")).hexdigest()[:12]
+
+    def parse(self, document: str, base_url: Optional[str] = None) -> List[Dict[str, str]]:
+        base_url = base_url or self.url
+        pairs = self._feed_links(document) if self.type == SOURCE_FEED else self._html_links(document)
+        articles, seen = [], set()
+        for title, href in pairs:
+            if not title or not href:
+                continue
+            url = urljoin(base_url, href.strip())
+            if url in seen or _is_ignored(url, self.ignore_domains):
+                continue
+            seen.add(url)
+            articles.append({"title": title, "url": url, "source": self.name})
+        return articles
+
+    def _extract(self, text: str, attributes, rule: str) -> Optional[str]:
+        value = attributes.get(rule[1:]) if rule.startswith("@") else text
+        return " ".join(value.split()) if value else None
+
+    def _html_links(self, html: str):
+        if HTML_ENGINE == "selectolax":
+            for node in LexborHTMLParser(html).css(self.selector):
+                text = node.text(separator=" ")
+                yield self._extract(text, node.attributes, self.title), self._extract(text, node.attributes, self.href)
+            return
+        try:
+            tree = lxml.html.fromstring(html)
+        except (etree.ParserError, ValueError):
+            return
+        for element in self._matcher(tree):
+            text = element.text_content()
+            yield self._extract(text, element.attrib, self.title), self._extract(text, element.attrib, self.href)
+
+    def _feed_links(self, xml: str):
+        try:
+            root = etree.fromstring(_XML_DECLARATION.sub("", xml, count=1).encode("utf-8"), parser=_FEED_PARSER)
+        except etree.XMLSyntaxError:
+            return
+        if root is None:
+            return
+        for item in _FEED_ITEMS(root):
+            link = None
+            for element in _FEED_LINKS(item):
+                # RSS : <link>url</link> ; Atom : <link rel="alternate" href="url"/>
+                if element.get("href") and element.get("rel", "alternate") == "alternate":
+                    link = element.get("href")
+                    break
+                if element.text and element.text.strip():
+                    link = element.text
+                    break
+            yield " ".join(_FEED_TITLE(item).split()), link
+
+
+def load_sources(path: str = SOURCES_PATH) -> Dict[str, Source]:
+    """Sources indexées par URL, avec la liste globale de domaines ignorés ajoutée à chacune."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    ignored = tuple(config.get("ignore_domains", []))
+    sources = {}
+    for entry in config["sources"]:
+        entry = {**entry, "ignore_domains": ignored + tuple(entry.get("ignore_domains", []))}
+        source = Source(**entry)
+        sources[source.url] = source
+    return sources